@@ -1,5 +1,20 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core.auth import forget_user
+        from core.db.routers import note_write
+        from core.db.sqlite import set_sqlite_pragmas
+
+        connection_created.connect(set_sqlite_pragmas,
+                                   dispatch_uid='core.sqlite_pragmas')
+        for signal in (post_save, post_delete):
+            signal.connect(forget_user, sender=settings.AUTH_USER_MODEL,
+                           dispatch_uid='core.forget_user')
+            signal.connect(note_write, dispatch_uid='core.note_write')
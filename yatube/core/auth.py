@@ -0,0 +1,37 @@
+"""Пользователь сессии без запроса в базу на каждый запрос.
+
+AuthenticationMiddleware на каждом запросе загружает пользователя через
+backend.get_user(). CachedModelBackend берёт его из кэша, а forget_user
+выбрасывает из кэша при любом сохранении или удалении пользователя —
+в том числе при смене пароля, так что проверка хэша сессии в
+django.contrib.auth.get_user() всегда видит актуальный пароль.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+
+USER_CACHE_KEY = 'auth:user:{}'
+
+
+class CachedModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username, password, **kwargs)
+        if user is None and password is not None:
+            # ModelBackend стоит следом только ради старых сессий: не даём
+            # ему проверять тот же неверный пароль второй раз
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        key = USER_CACHE_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+def forget_user(sender, instance, **kwargs):
+    cache.delete(USER_CACHE_KEY.format(instance.pk))
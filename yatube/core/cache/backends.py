@@ -0,0 +1,351 @@
+"""Двухуровневый кэш: маленький LRU в памяти процесса перед общим кэшем.
+
+Первый уровень (L1) — ограниченный по числу записей LRU с коротким TTL,
+один на процесс и общий для его потоков. Второй (L2) — кэш Django из
+CACHES, общий для всех процессов. На L2 держатся аренды (add) и версии
+(incr), поэтому он обязан делать их атомарно: Memcached или Redis.
+Файловый кэш и LocMemCache годятся только для одного процесса —
+разработки и тестов — и разрешаются опцией SINGLE_PROCESS; тогда add и
+incr атомарны за счёт блокировки внутри процесса.
+
+Каждая запись и удаление публикуются в L2 журналом инвалидаций: счётчик
+SEQUENCE_KEY и кольцо из LOG_SIZE ключей INVALIDATED_KEY, в каждом номер
+записи и изменённые ею ключи. Раз в SYNC_INTERVAL секунд процесс
+дочитывает журнал и выбрасывает из L1 изменённые другими процессами
+ключи, поэтому L1 не переживает удаление из L2 дольше этого интервала.
+Если журнал прочитать не удалось (вытеснен, перезаписан по кругу, сброшен
+clear()), L1 очищается целиком.
+
+Пример настроек:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.backends.TwoTierCache',
+            'LOCATION': 'default',
+            'OPTIONS': {
+                'SHARED': 'shared',     # алиас L2 в CACHES
+                'MAX_ENTRIES': 1000,    # размер L1
+                'LOCAL_TIMEOUT': 5,     # TTL записей L1, с
+                'SYNC_INTERVAL': 1,     # как часто читать журнал, с
+                'LOG_SIZE': 1000,       # длина кольца журнала
+                'SINGLE_PROCESS': False,
+            },
+        },
+        'shared': {...},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+SEQUENCE_KEY = 'two-tier:sequence'
+INVALIDATED_KEY = 'two-tier:invalidated:{}'
+# сколько живут записи журнала инвалидаций в L2
+LOG_TIMEOUT = 5 * 60
+# бэкенды, у которых add и incr атомарны для всех процессов
+ATOMIC_BACKENDS = (
+    'django.core.cache.backends.memcached.MemcachedCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+    'django_redis.cache.RedisCache',
+)
+
+_missing = object()
+_stores = {}
+_stores_lock = threading.Lock()
+# делает add и incr атомарными на L2 для одного процесса
+_atomic_lock = threading.Lock()
+
+
+def has_atomic_add(cache):
+    """Делает ли кэш add атомарно — на этом держатся аренды."""
+    backend = type(cache)
+    return (getattr(cache, 'atomic_add', False)
+            or f'{backend.__module__}.{backend.__qualname__}'
+            in ATOMIC_BACKENDS)
+
+
+class LocalStore:
+    """LRU с TTL и счётчиками попаданий, общий для потоков процесса.
+
+    Значения хранятся сериализованными, как в LocMemCache: закэшированный
+    ответ не должен меняться от того, что его правит отдавший его код.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.sequence = None
+        self.synced_at = None
+        self.counters = dict.fromkeys(
+            ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'), 0)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _missing
+            expires, pickled = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return _missing
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout):
+        if timeout <= 0:
+            self.discard([key])
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters, l1_entries=len(self.entries))
+        for tier in ('l1', 'l2'):
+            hits = stats[f'{tier}_hits']
+            total = hits + stats[f'{tier}_misses']
+            stats[f'{tier}_hit_rate'] = round(hits / total, 3) if total else 0
+        return stats
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters = dict.fromkeys(self.counters, 0)
+
+
+class TwoTierCache(BaseCache):
+    # L2 проверяется в __init__, в одном процессе add идёт под блокировкой
+    atomic_add = True
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._sync_interval = options.get('SYNC_INTERVAL', 1)
+        self._log_size = options.get('LOG_SIZE', 1000)
+        backend = settings.CACHES[self._shared_alias]['BACKEND']
+        self._atomic_lock = None
+        if backend not in ATOMIC_BACKENDS:
+            if not options.get('SINGLE_PROCESS'):
+                raise ImproperlyConfigured(
+                    f'{backend} не делает add и incr атомарно для '
+                    f'нескольких процессов: общим уровнем кэша нужен '
+                    f'Memcached или Redis, либо SINGLE_PROCESS для '
+                    f'разработки')
+            self._atomic_lock = _atomic_lock
+        with _stores_lock:
+            if location not in _stores:
+                _stores[location] = LocalStore(self._max_entries)
+            self._local = _stores[location]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def stats(self):
+        """Попадания в L1 и L2 этого процесса."""
+        return self._local.stats()
+
+    def reset_stats(self):
+        self._local.reset_stats()
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        self._sync()
+        value = self._local.get(local_key)
+        if value is not _missing:
+            self._local.count(l1_hits=1)
+            return value
+        value = self.shared.get(key, _missing, version=version)
+        if value is _missing:
+            self._local.count(l1_misses=1, l2_misses=1)
+            return default
+        self._local.count(l1_misses=1, l2_hits=1)
+        self._local.set(local_key, value, self._local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = {}
+        for key in keys:
+            local_key = self._local_key(key, version)
+            value = self._local.get(local_key)
+            if value is _missing:
+                missing[key] = local_key
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(list(missing), version=version)
+            for key, value in shared.items():
+                self._local.set(missing[key], value, self._local_timeout)
+            found.update(shared)
+            self._local.count(l2_hits=len(shared),
+                              l2_misses=len(missing) - len(shared))
+        self._local.count(l1_hits=len(keys) - len(missing),
+                          l1_misses=len(missing))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        local_key = self._local_key(key, version)
+        self._publish([local_key])
+        self._local.set(local_key, value, self._local_ttl(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self._local_key(key, version)
+        added = self._shared_add(key, value, timeout, version=version)
+        if added:
+            self._publish([local_key])
+            self._local.set(local_key, value, self._local_ttl(timeout))
+        else:
+            self._local.discard([local_key])
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        local_keys = {key: self._local_key(key, version) for key in data}
+        self._publish(list(local_keys.values()))
+        ttl = self._local_ttl(timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self._local.set(local_keys[key], value, ttl)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self._shared_incr(key, delta, version=version)
+        local_key = self._local_key(key, version)
+        self._publish([local_key])
+        self._local.set(local_key, value, self._local_timeout)
+        return value
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        local_key = self._local_key(key, version)
+        self._publish([local_key])
+        self._local.discard([local_key])
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        local_keys = [self._local_key(key, version) for key in keys]
+        self._publish(local_keys)
+        self._local.discard(local_keys)
+
+    def clear(self):
+        # вместе с L2 пропадает и журнал, остальные процессы увидят это
+        # при следующей сверке и очистят свой L1 целиком
+        self.shared.clear()
+        self._local.clear()
+        self._local.sequence = None
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    def _local_key(self, key, version):
+        local_key = self.make_key(key, version)
+        self.validate_key(local_key)
+        return local_key
+
+    def _local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _shared_add(self, key, value, timeout=DEFAULT_TIMEOUT,
+                    version=None):
+        if self._atomic_lock is None:
+            return self.shared.add(key, value, timeout, version=version)
+        with self._atomic_lock:
+            return self.shared.add(key, value, timeout, version=version)
+
+    def _shared_incr(self, key, delta=1, version=None):
+        if self._atomic_lock is None:
+            return self.shared.incr(key, delta, version=version)
+        # BaseCache.incr перезаписывает ключ со сроком по умолчанию, а
+        # счётчики здесь (версии, номер журнала) бессрочные
+        with self._atomic_lock:
+            value = self.shared.get(key, version=version)
+            if value is None:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            self.shared.set(key, value, None, version=version)
+            return value
+
+    def _log_key(self, number):
+        return INVALIDATED_KEY.format(number % self._log_size)
+
+    def _publish(self, local_keys):
+        """Записывает ключи в журнал инвалидаций для других процессов."""
+        if not local_keys:
+            return
+        try:
+            sequence = self._shared_incr(SEQUENCE_KEY)
+        except ValueError:
+            self._shared_add(SEQUENCE_KEY, 0, None)
+            sequence = self._shared_incr(SEQUENCE_KEY)
+        self.shared.set(self._log_key(sequence), (sequence, local_keys),
+                        LOG_TIMEOUT)
+        if self._local.sequence == sequence - 1:
+            # между сверкой и этой записью других не было — свои же
+            # изменения при сверке перечитывать незачем
+            self._local.sequence = sequence
+
+    def _sync(self):
+        """Выбрасывает из L1 ключи, изменённые другими процессами."""
+        local = self._local
+        now = time.monotonic()
+        if (local.synced_at is not None
+                and now - local.synced_at < self._sync_interval):
+            return
+        local.synced_at = now
+        shared = self.shared
+        sequence = shared.get(SEQUENCE_KEY)
+        previous, local.sequence = local.sequence, sequence
+        if sequence == previous:
+            return
+        if (sequence is None or previous is None or sequence < previous
+                or sequence - previous > self._log_size):
+            # кольцо журнала уже перезаписано — неизвестно, что менялось
+            local.clear()
+            return
+        numbers = range(previous + 1, sequence + 1)
+        log = shared.get_many([self._log_key(number) for number in numbers])
+        invalidated = []
+        for number in numbers:
+            entry = log.get(self._log_key(number))
+            if entry is None or entry[0] != number:
+                # запись вытеснена или ещё не дописана
+                local.clear()
+                return
+            invalidated.extend(entry[1])
+        local.discard(invalidated)
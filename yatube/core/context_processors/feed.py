@@ -0,0 +1,7 @@
+from django.conf import settings
+
+
+def feed(request):
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
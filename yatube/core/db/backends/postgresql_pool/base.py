@@ -0,0 +1,70 @@
+"""PostgreSQL с пулом соединений внутри процесса.
+
+Django 2.2 умеет только держать одно соединение на поток (CONN_MAX_AGE).
+Этот бэкенд берёт соединения из psycopg2.pool.ThreadedConnectionPool и
+возвращает их туда вместо закрытия, так что с CONN_MAX_AGE = 0 соединение
+живёт в пуле, а не привязано к потоку. Размер пула задаётся в OPTIONS:
+POOL_MIN_SIZE и POOL_MAX_SIZE; POOL_TIMEOUT — сколько секунд поток ждёт
+свободное соединение, когда все выданы (pool.BlockingPool).
+"""
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool
+
+from .pool import BlockingPool
+
+POOL_OPTIONS = ('POOL_MIN_SIZE', 'POOL_MAX_SIZE', 'POOL_TIMEOUT')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, conn_params, min_size, max_size, timeout):
+    with _pools_lock:
+        connection_pool = _pools.get(alias)
+        if connection_pool is None:
+            connection_pool = _pools[alias] = BlockingPool(
+                pool.ThreadedConnectionPool(min_size, max_size,
+                                            **conn_params),
+                max_size, timeout, error=pool.PoolError)
+        return connection_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        for name in POOL_OPTIONS:
+            conn_params.pop(name, None)
+        return conn_params
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS']
+        return get_pool(self.alias, self.get_connection_params(),
+                        options.get('POOL_MIN_SIZE', 1),
+                        options.get('POOL_MAX_SIZE', 10),
+                        options.get('POOL_TIMEOUT', 30))
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.getconn()
+        # то же, что делает родительский get_new_connection после connect()
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # сломанное соединение закрываем, а не возвращаем в пул;
+        # незавершённую транзакцию пул откатит сам
+        broken = bool(self.connection.closed) or (
+            self.errors_occurred and not self.is_usable())
+        with self.wrap_database_errors:
+            self.pool.putconn(self.connection, close=broken)
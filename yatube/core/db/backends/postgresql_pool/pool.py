@@ -0,0 +1,36 @@
+"""Пул, который при нехватке соединений ждёт, а не падает.
+
+ThreadedConnectionPool из psycopg2, когда все POOL_MAX_SIZE соединений
+выданы, сразу бросает PoolError — потоков больше, чем соединений, и лишние
+запросы получали бы 500. BlockingPool ограничивает число выданных
+соединений семафором: getconn ждёт освободившееся до timeout секунд и
+только потом бросает error.
+"""
+import threading
+
+
+class BlockingPool:
+    def __init__(self, pool, max_size, timeout, error=RuntimeError):
+        self.pool = pool
+        self.timeout = timeout
+        self.error = error
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise self.error(
+                f'За {self.timeout} с в пуле не освободилось соединение')
+        try:
+            return self.pool.getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        try:
+            self.pool.putconn(connection, close=close)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        self.pool.closeall()
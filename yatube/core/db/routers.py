@@ -0,0 +1,86 @@
+"""Чтение лент с реплик и запись только в основную базу.
+
+Вью, обёрнутые read_from_replica, читают с одной из реплик из
+DATABASE_REPLICAS; всё остальное, включая любые записи, идёт в default.
+Вью, обёрнутые pin_to_primary, после успешной записи закрепляют сессию за
+основной базой на REPLICA_PIN_SECONDS, чтобы пользователь сразу увидел свой
+пост или комментарий, даже если реплика ещё отстаёт. read_from_replica
+оставляет время чтения в request.replica_read_at: posts.cache по нему не
+хранит такие страницы дольше отставания и не ставит им свежий ETag.
+"""
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_SESSION_KEY = '_db_pinned_until'
+
+_local = threading.local()
+
+
+def is_pinned(request):
+    return request.session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def read_from_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or is_pinned(request):
+            return view(request, *args, **kwargs)
+        # сессия уже прочитана, пользователя тоже загружаем из основной
+        # базы до переключения: свежий вход может ещё не доехать до реплики
+        request.user.pk
+        previous = getattr(_local, 'read_alias', None)
+        _local.read_alias = random.choice(replicas)
+        # кэши страниц не должны выдавать прочитанное с реплики за свежее
+        request.replica_read_at = time.time()
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.read_alias = previous
+    return wrapper
+
+
+def note_write(sender, **kwargs):
+    """post_save/post_delete: считает записи внутри pin_to_primary."""
+    if getattr(_local, 'writes', None) is not None:
+        _local.writes += 1
+
+
+def pin_to_primary(view):
+    """Закрепляет сессию, только если вью что-то сохранила или удалила и
+    ответила редиректом: так заканчиваются удачные отправки форм и
+    подписки. Открытие формы и форма с ошибками сессию не закрепляют."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.DATABASE_REPLICAS:
+            return view(request, *args, **kwargs)
+        previous = getattr(_local, 'writes', None)
+        _local.writes = 0
+        try:
+            response = view(request, *args, **kwargs)
+            wrote = _local.writes > 0
+        finally:
+            _local.writes = previous
+        if wrote and 300 <= response.status_code < 400:
+            request.session[PIN_SESSION_KEY] = (
+                time.time() + settings.REPLICA_PIN_SECONDS)
+        return response
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return getattr(_local, 'read_alias', None)
+
+    def db_for_write(self, model, **hints):
+        # явно, иначе Django запишет объект туда, откуда его прочитал
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # во всех базах одни и те же данные
+        return True
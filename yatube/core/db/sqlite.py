@@ -0,0 +1,12 @@
+from django.conf import settings
+
+
+def set_sqlite_pragmas(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение с SQLite прагмами из
+    SQLITE_PRAGMAS: WAL позволяет читать во время записи, а busy_timeout
+    заставляет писателей ждать блокировку, а не падать сразу."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в файлы реплик из DB_REPLICAS — '
+            'локальная замена репликации для проверки маршрутизации')
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Реплики не-SQLite баз обновляет сама СУБД')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены, задайте DB_REPLICAS')
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections[alias]
+            # backup() переписывает файл реплики целиком
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            replica.close()
+            self.stdout.write(self.style.SUCCESS(
+                f'{alias}: {replica.settings_dict["NAME"]}'))
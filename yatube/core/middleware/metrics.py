@@ -0,0 +1,171 @@
+"""Метрики запросов: число и время SQL, время рендера шаблонов и попадание
+в кэш страниц по имени URL.
+
+Каждый ответ получает заголовок Server-Timing, а сводные гистограммы
+копятся в памяти процесса и отдаются вью core.views.request_metrics.
+При REQUEST_METRICS_ENABLED = False middleware выключается целиком через
+MiddlewareNotUsed и ничего не стоит.
+"""
+import bisect
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+DURATION_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+HISTOGRAMS = ('total_ms', 'sql_ms', 'template_ms', 'queries')
+
+_local = threading.local()
+_original_render = Template.render
+
+
+def _timed_render(self, context):
+    metrics = getattr(_local, 'metrics', None)
+    if metrics is None or metrics.rendering:
+        # вложенные шаблоны ({% include %}, {% extends %}) уже внутри
+        # замера внешнего
+        return _original_render(self, context)
+    metrics.rendering = True
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        metrics.template_time += time.perf_counter() - started
+        metrics.rendering = False
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+        self.cache = 'none'
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        return ', '.join((
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.queries} q"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc={self.cache}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # последняя ячейка — всё, что больше верхней границы
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def as_dict(self):
+        labels = [f'<={bound}' for bound in self.buckets]
+        labels.append(f'>{self.buckets[-1]}')
+        return {'buckets': dict(zip(labels, self.counts)),
+                'sum': round(self.total, 3)}
+
+
+class MetricsRegistry:
+    """Гистограммы по именам URL в памяти текущего процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, name, metrics):
+        with self._lock:
+            view = self._views.get(name)
+            if view is None:
+                view = self._views[name] = {
+                    'requests': 0,
+                    'cache': {'hit': 0, 'miss': 0, 'stale': 0, 'none': 0},
+                    'total_ms': Histogram(DURATION_BUCKETS_MS),
+                    'sql_ms': Histogram(DURATION_BUCKETS_MS),
+                    'template_ms': Histogram(DURATION_BUCKETS_MS),
+                    'queries': Histogram(QUERY_BUCKETS),
+                }
+            view['requests'] += 1
+            view['cache'][metrics.cache] += 1
+            view['total_ms'].add(metrics.total_time * 1000)
+            view['sql_ms'].add(metrics.sql_time * 1000)
+            view['template_ms'].add(metrics.template_time * 1000)
+            view['queries'].add(metrics.queries)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for name, view in sorted(self._views.items()):
+                result[name] = {
+                    'requests': view['requests'],
+                    'cache': dict(view['cache']),
+                }
+                for key in HISTOGRAMS:
+                    result[name][key] = view[key].as_dict()
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def cache_status(request):
+    # posts.cache.cached_view пишет статус на запрос сам
+    status = getattr(request, 'cache_status', None)
+    if status is not None:
+        return status
+    # FetchFromCacheMiddleware из cache_page отмечает на запросе, нужно ли
+    # сохранять ответ: False для GET — значит, ответ взят из кэша
+    update_cache = getattr(request, '_cache_update_cache', None)
+    if update_cache is None:
+        return 'none'
+    if update_cache:
+        return 'miss'
+    return 'hit' if request.method in ('GET', 'HEAD') else 'none'
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        Template.render = _timed_render
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        _local.metrics = metrics
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        metrics.total_time = time.perf_counter() - started
+        metrics.cache = cache_status(request)
+        match = request.resolver_match
+        registry.record(match.view_name if match else '<unresolved>',
+                        metrics)
+        response['Server-Timing'] = metrics.server_timing()
+        return response
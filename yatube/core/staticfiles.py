@@ -0,0 +1,78 @@
+"""Хранилище статики с хэшами в именах и сжатыми копиями файлов.
+
+ManifestStaticFilesStorage добавляет к имени файла хэш содержимого
+(css/bootstrap.min.3c9d4b1e.css), поэтому такие файлы можно кэшировать
+навсегда. После этого collectstatic дополнительно пишет рядом с каждым
+хэшированным текстовым файлом .gz и, если установлен пакет brotli, .br —
+их отдаёт core.middleware.static.StaticFilesMiddleware.
+"""
+import gzip
+import io
+import logging
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.ico', '.json',
+                           '.txt', '.xml', '.html')
+# сжатая копия не пишется, если экономит меньше этой доли
+MIN_SAVING = 0.05
+
+logger = logging.getLogger(__name__)
+
+
+def gzip_bytes(data):
+    buffer = io.BytesIO()
+    # mtime=0, чтобы повторный collectstatic давал те же байты
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+                       mtime=0) as compressed:
+        compressed.write(data)
+    return buffer.getvalue()
+
+
+def encoders():
+    """Доступные кодировки: (суффикс файла, функция сжатия)."""
+    available = [('.gz', gzip_bytes)]
+    if brotli is not None:
+        available.insert(0, ('.br', brotli.compress))
+    return available
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, *args, **kwargs):
+        yield from super().post_process(*args, **kwargs)
+        if kwargs.get('dry_run'):
+            return
+        if brotli is None:
+            logger.warning('Пакет brotli не установлен: пишутся только .gz, '
+                           'браузеры получат статику крупнее, чем могли бы')
+        for name in sorted(set(self.hashed_files.values())):
+            yield from self.compress(name)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        for suffix, encode in encoders():
+            compressed = encode(data)
+            if len(compressed) > len(data) * (1 - MIN_SAVING):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+            yield name, name + suffix, True
+
+    def is_hashed(self, name):
+        """Имя из манифеста, то есть с хэшем содержимого."""
+        if not hasattr(self, '_hashed_names'):
+            self._hashed_names = {
+                os.path.normpath(hashed)
+                for hashed in self.hashed_files.values()}
+        return os.path.normpath(name) in self._hashed_names
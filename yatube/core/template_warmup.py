@@ -0,0 +1,47 @@
+"""Разбор всех шаблонов проекта при старте процесса.
+
+С кэширующим загрузчиком каждый шаблон читается и разбирается при первом
+рендере, то есть в первых запросах каждого воркера. warm_up_templates()
+делает это заранее: обходит каталоги всех загрузчиков и загружает каждый
+найденный файл.
+"""
+import logging
+import os
+
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(engine):
+    """Имена всех файлов в каталогах загрузчиков движка."""
+    names = set()
+    for loader in engine.template_loaders:
+        # у кэширующего загрузчика каталоги знают вложенные загрузчики
+        for inner in getattr(loader, 'loaders', [loader]):
+            for directory in getattr(inner, 'get_dirs', list)():
+                for root, _, files in os.walk(directory):
+                    for name in files:
+                        path = os.path.relpath(os.path.join(root, name),
+                                               directory)
+                        names.add(path.replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_up_templates(backends=None):
+    """Загружает все шаблоны; возвращает число разобранных без ошибок."""
+    if backends is None:
+        backends = engines.all()
+    compiled = 0
+    for backend in backends:
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        for name in template_names(backend.engine):
+            try:
+                backend.engine.get_template(name)
+            except Exception:
+                logger.warning('Шаблон %s не разобран', name, exc_info=True)
+            else:
+                compiled += 1
+    return compiled
@@ -0,0 +1,348 @@
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core.cache.backends import INVALIDATED_KEY, TwoTierCache
+from core.db.backends.postgresql_pool.pool import BlockingPool
+from core.middleware.metrics import registry
+from core.middleware.static import StaticFilesMiddleware
+from core.template_warmup import warm_up_templates
+
+User = get_user_model()
+
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+
+    def test_server_timing_and_cache_status(self):
+        url = reverse('posts:index')
+        first = Client().get(url)
+        second = Client().get(url)
+        self.assertIn('sql;dur=', first['Server-Timing'])
+        self.assertIn('tpl;dur=', first['Server-Timing'])
+        self.assertIn('cache;desc=miss', first['Server-Timing'])
+        self.assertIn('cache;desc=hit', second['Server-Timing'])
+        stats = registry.snapshot()['posts:index']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['cache'],
+                         {'hit': 1, 'miss': 1, 'stale': 0, 'none': 0})
+        self.assertEqual(sum(stats['queries']['buckets'].values()), 2)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        url = reverse('request_metrics')
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 302)
+        client = Client()
+        client.force_login(self.staff)
+        Client().get(reverse('about:author'))
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('about:author', response.json())
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled_middleware_adds_nothing(self):
+        response = Client().get(reverse('about:author'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.snapshot(), {})
+
+
+class SQLitePragmasTest(SimpleTestCase):
+    def test_new_connection_gets_pragmas(self):
+        """Каждое новое соединение с SQLite получает SQLITE_PRAGMAS."""
+        directory = tempfile.mkdtemp()
+        settings_dict = dict(connections['default'].settings_dict,
+                             NAME=os.path.join(directory, 'pragmas.sqlite3'))
+        wrapper = connections['default'].__class__(settings_dict, 'pragmas')
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 5000)
+                cursor.execute('PRAGMA synchronous')
+                # 1 — NORMAL
+                self.assertEqual(cursor.fetchone()[0], 1)
+        finally:
+            wrapper.close()
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+
+
+class FakeConnectionPool:
+    def __init__(self):
+        self.connections = []
+
+    def getconn(self):
+        connection = object()
+        self.connections.append(connection)
+        return connection
+
+    def putconn(self, connection, close=False):
+        self.connections.remove(connection)
+
+
+class BlockingPoolTest(SimpleTestCase):
+    def test_full_pool_waits_then_fails(self):
+        pool = BlockingPool(FakeConnectionPool(), 1, 0.05)
+        pool.getconn()
+        with self.assertRaises(RuntimeError):
+            pool.getconn()
+
+    def test_waiting_thread_gets_released_connection(self):
+        pool = BlockingPool(FakeConnectionPool(), 1, 5)
+        connection = pool.getconn()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertEqual(got, [])
+        pool.putconn(connection)
+        waiter.join()
+        self.assertEqual(len(got), 1)
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['shared'].clear()
+
+    def make_cache(self, name, **options):
+        """Отдельный L1 над общим L2 — как кэш другого процесса."""
+        options = dict({'SHARED': 'shared', 'SYNC_INTERVAL': 0,
+                        'SINGLE_PROCESS': True}, **options)
+        return TwoTierCache(f'{self.id()}-{name}', {'OPTIONS': options})
+
+    def test_repeated_reads_hit_local_tier(self):
+        first = self.make_cache('first')
+        first.set('key', 'value')
+        second = self.make_cache('second')
+        self.assertEqual(second.get('key'), 'value')
+        self.assertEqual(second.get('key'), 'value')
+        stats = second.stats()
+        self.assertEqual((stats['l1_hits'], stats['l1_misses']), (1, 1))
+        self.assertEqual((stats['l2_hits'], stats['l2_misses']), (1, 0))
+
+    def test_delete_in_other_process_drops_local_copy(self):
+        first = self.make_cache('first')
+        second = self.make_cache('second')
+        first.set('key', 'old')
+        second.get_many(['key'])
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+        first.set('key', 'new')
+        self.assertEqual(second.get('key'), 'new')
+
+    def test_clear_resets_all_local_tiers(self):
+        first = self.make_cache('first')
+        second = self.make_cache('second')
+        first.set('key', 'value')
+        self.assertEqual(second.get('key'), 'value')
+        first.clear()
+        self.assertIsNone(second.get('key'))
+
+    def test_local_tier_is_bounded(self):
+        bounded = self.make_cache('bounded', MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            bounded.set(key, key)
+        self.assertEqual(bounded.stats()['l1_entries'], 2)
+        self.assertEqual(bounded.get('a'), 'a')
+        self.assertEqual(bounded.stats()['l2_hits'], 1)
+
+    def test_non_atomic_shared_tier_needs_single_process(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.make_cache('shared-by-many', SINGLE_PROCESS=False)
+
+    def test_invalidation_log_is_bounded_ring(self):
+        first = self.make_cache('first', LOG_SIZE=3)
+        second = self.make_cache('second', LOG_SIZE=3)
+        second.set('key', 'old')
+        for number in range(5):
+            first.set(f'other-{number}', number)
+        caches['shared'].set('key', 'new')
+        # журнал перезаписан по кругу — L1 второго очищается целиком
+        self.assertEqual(second.get('key'), 'new')
+        shared = caches['shared']
+        self.assertIsNone(shared.get(INVALIDATED_KEY.format(3)))
+        self.assertEqual(
+            len(shared.get_many([INVALIDATED_KEY.format(n)
+                                 for n in range(3)])), 3)
+
+    def test_single_process_file_tier_counts_atomically(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        files = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }
+        with override_settings(CACHES=dict(settings.CACHES, files=files)):
+            counter = self.make_cache('files', SHARED='files')
+            counter.add('counter', 0, None)
+
+            def bump():
+                for _ in range(25):
+                    counter.incr('counter')
+            threads = [threading.Thread(target=bump) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # BaseCache.incr поставил бы ключу срок в 300 секунд
+            with mock.patch('django.core.cache.backends.filebased.time.time',
+                            return_value=time.time() + 1000):
+                self.assertEqual(caches['files'].get('counter'), 100)
+
+
+class TemplateWarmUpTest(SimpleTestCase):
+    def test_warm_up_fills_cached_loader(self):
+        params = settings.TEMPLATES[0]
+        loaders = [('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])]
+        backend = DjangoTemplates({
+            'NAME': 'warm-up',
+            'DIRS': params['DIRS'],
+            'APP_DIRS': False,
+            'OPTIONS': dict(params['OPTIONS'], loaders=loaders),
+        })
+        self.assertGreater(warm_up_templates([backend]), 0)
+        cached = backend.engine.template_loaders[0].get_template_cache
+        for name in ('posts/index.html', 'posts/includes/post_card.html',
+                     'admin/base.html'):
+            with self.subTest(name=name):
+                self.assertIn(name, cached)
+
+
+class StaticPipelineTest(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.source, 'css'))
+        self.css = b'body { color: #333; }\n' * 100
+        with open(os.path.join(self.source, 'css', 'site.css'), 'wb') as f:
+            f.write(self.css)
+        settings_override = override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATIC_ROOT=self.root,
+            STATICFILES_STORAGE=(
+                'core.staticfiles.CompressedManifestStaticFilesStorage'),
+            STATICFILES_SERVE=True,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # без brotli, чтобы проверить предупреждение и не зависеть от того,
+        # установлен ли пакет
+        with mock.patch('core.staticfiles.brotli', None), self.assertLogs(
+                'core.staticfiles', 'WARNING') as logs:
+            call_command('collectstatic', interactive=False, verbosity=0)
+        self.warnings = logs.output
+        self.hashed = staticfiles_storage.stored_name('css/site.css')
+        self.middleware = StaticFilesMiddleware(
+            lambda request: HttpResponse(status=404))
+
+    def get(self, name, encoding=''):
+        request = RequestFactory().get(f'/static/{name}',
+                                       HTTP_ACCEPT_ENCODING=encoding)
+        return self.middleware(request)
+
+    def test_collectstatic_writes_hashed_gzip_copy(self):
+        self.assertNotEqual(self.hashed, 'css/site.css')
+        with open(os.path.join(self.root, self.hashed + '.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.css)
+
+    def test_collectstatic_warns_without_brotli(self):
+        self.assertEqual(len(self.warnings), 1)
+        self.assertIn('brotli', self.warnings[0])
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, self.hashed + '.br')))
+
+    def test_serves_precompressed_file_by_accept_encoding(self):
+        response = self.get(self.hashed, 'gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)),
+                         self.css)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        response = self.get(self.hashed, 'gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), self.css)
+
+    def test_unhashed_and_missing_files(self):
+        response = self.get('css/site.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.get('css/missing.css').status_code, 404)
+        self.assertEqual(self.get('../secret.txt').status_code, 404)
+
+
+class CachedAuthTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cached-auth')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('about:author')
+
+    def test_session_and_user_come_from_cache(self):
+        """Повторный запрос вошедшего пользователя не ходит в базу."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_session_from_model_backend_still_valid(self):
+        """Сессии, открытые до CachedModelBackend, не разлогиниваются."""
+        client = Client()
+        client.force_login(
+            self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = client.get(self.url)
+        self.assertEqual(response.wsgi_request.user, self.user)
+
+    def test_wrong_password_checked_once(self):
+        """Запасной ModelBackend не проверяет неверный пароль повторно."""
+        with mock.patch.object(User, 'check_password',
+                               return_value=False) as check_password:
+            self.assertFalse(Client().login(username='cached-auth',
+                                            password='wrong'))
+        self.assertEqual(check_password.call_count, 1)
+
+    def test_password_change_ends_cached_session(self):
+        self.client.get(self.url)
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password-1')
+        user.save()
+        response = self.client.get(self.url)
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
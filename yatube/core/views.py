@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from core.middleware.metrics import registry
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +20,17 @@ def permission_denied(request, exception):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+@staff_member_required
+def request_metrics(request):
+    """Гистограммы метрик запросов этого процесса и попадания в уровни
+    кэша, если он их считает; ?reset=1 обнуляет их."""
+    data = registry.snapshot()
+    if hasattr(cache, 'stats'):
+        data['cache_tiers'] = cache.stats()
+    if request.GET.get('reset'):
+        registry.reset()
+        if hasattr(cache, 'reset_stats'):
+            cache.reset_stats()
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
@@ -5,7 +5,10 @@ import sys
 
 
 def main():
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    # тестам нужны зеркало базы для реплики и кэш в памяти
+    settings_module = ('yatube.settings_test' if sys.argv[1:2] == ['test']
+                       else 'yatube.settings')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
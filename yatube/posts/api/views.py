@@ -0,0 +1,127 @@
+"""Read-only JSON API лент для мобильных клиентов.
+
+Повторяет HTML-ленты, но всегда с курсорной пагинацией. ETag строится из
+версии ленты в кэше, Last-Modified — из времени её последнего изменения,
+так что неизменившаяся лента отвечает 304 без выборки постов. Оба
+меняются и при удалении постов и групп.
+
+С ?since=<ISO-время> лента отдаёт только посты, изменённые позже этого
+момента, от старых изменений к новым — для инкрементальной синхронизации.
+Удалённые посты в такой выдаче не видны.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_safe
+from django.views.decorators.vary import vary_on_cookie
+
+from .. import thumbnails
+from ..cache import get_feed_version, get_versions, version_time
+from ..models import TIMELINE_ORDERING, Group, Post, User, UserStats
+from ..paginators import CursorPaginator
+from .serializers import serialize_author, serialize_group, serialize_post
+
+# компактный JSON: без пробелов и без \u-экранирования кириллицы
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def api_view(login_required=False):
+    """GET/HEAD, ошибки в JSON и 401 вместо редиректа на страницу входа."""
+    def decorator(view):
+        @require_safe
+        @vary_on_cookie
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if login_required and not request.user.is_authenticated:
+                return JsonResponse({'detail': 'Нужна авторизация'},
+                                    status=401)
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return JsonResponse({'detail': 'Не найдено'}, status=404)
+        return wrapper
+    return decorator
+
+
+def feed_etag(request, *args, **kwargs):
+    # версия меняется при любом изменении постов, групп, комментариев и
+    # подписок; пользователь нужен, чтобы ленты подписок не совпадали
+    return f'{get_feed_version()}-{request.user.pk or 0}'
+
+
+def feed_last_modified(request, *args, **kwargs):
+    return version_time(*get_versions('feed'))
+
+
+def parse_since(value):
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        since = None
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.utc)
+    return since
+
+
+def feed_response(request, queryset, ordering=('-pub_date', '-id'),
+                  **extra):
+    if 'since' in request.GET:
+        since = parse_since(request.GET['since'])
+        if since is None:
+            return JsonResponse(
+                {'detail': 'since должен быть датой и временем в ISO 8601'},
+                status=400)
+        queryset = queryset.filter(updated_at__gt=since)
+        ordering = ('updated_at', 'id')
+    paginator = CursorPaginator(queryset, settings.CONSTANTA_POSTS_ON_PAGE,
+                                ordering=ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    thumbnails.attach(page)
+    return JsonResponse({
+        **extra,
+        'results': [serialize_post(post) for post in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }, json_dumps_params=JSON_PARAMS)
+
+
+@api_view()
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def index(request):
+    return feed_response(request, Post.objects.feed())
+
+
+@api_view()
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, Post.objects.feed().filter(group=group),
+                         group=serialize_group(group))
+
+
+@api_view()
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    stats = UserStats.objects.for_user(author)
+    return feed_response(request, author.posts.feed(),
+                         author=serialize_author(author, stats))
+
+
+@api_view()
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    thumbnails.attach([post])
+    return JsonResponse(serialize_post(post), json_dumps_params=JSON_PARAMS)
+
+
+@api_view(login_required=True)
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def follow_index(request):
+    return feed_response(request, Post.objects.feed().timeline(request.user),
+                         ordering=TIMELINE_ORDERING)
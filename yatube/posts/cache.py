@@ -0,0 +1,313 @@
+import hashlib
+import math
+import random
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from core.cache.backends import has_atomic_add
+
+FEED_VERSION_KEY = 'posts:feed_version'
+SCOPE_VERSION_KEY = 'posts:version:{}'
+# область, от которой зависит каждая страница с валидаторами
+ALL_SCOPE = 'all'
+# как часто запрос без копии в кэше проверяет, не готова ли страница
+LEASE_POLL_INTERVAL = 0.05
+
+
+def get_feed_version():
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        # Начинаем с текущего времени, а не с единицы: если ключ вытеснят
+        # из кэша, новая версия не совпадёт ни с одной из старых.
+        cache.add(FEED_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    # сама версия — счётчик, а время изменения для Last-Modified хранится
+    # версией области 'feed'
+    bump_versions('feed')
+    try:
+        return cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        return get_feed_version()
+
+
+def cached_view(timeout=None, version=None, stale_timeout=None,
+                lease_timeout=None, beta=1.0):
+    """Кэширует ответы GET/HEAD вью так, чтобы истечение записи не
+    запускало рендер во всех одновременных запросах сразу.
+
+    Запись хранится под ключом из адреса и Cookie вместе с версией
+    version(), сроком годности и временем рендера. Устаревшую запись
+    (истёк срок или сменилась версия) перестраивает только тот запрос,
+    которому досталась аренда — ключ, заведённый через cache.add(); остальные
+    тем временем получают старую копию, а если её нет — ждут новую до
+    lease_timeout секунд. Старая копия живёт stale_timeout секунд после
+    срока. Незадолго до срока запись с вероятностью, растущей вместе со
+    временем рендера, обновляется заранее (XFetch, beta — насколько
+    заранее).
+
+    Аренда исключительна, только если add кэша атомарен, поэтому с кэшем
+    по умолчанию без такого add (например, FileBasedCache напрямую) вью
+    отвечает ImproperlyConfigured.
+
+    Незаданные timeout, stale_timeout и lease_timeout читаются из
+    FEED_CACHE_TIMEOUT, FEED_CACHE_STALE_TIMEOUT и FEED_CACHE_LEASE_TIMEOUT
+    при каждом запросе. Статус кэша ('hit', 'miss', 'stale') остаётся в
+    request.cache_status для метрик и для conditional_page, который не
+    ставит валидаторы на старую копию.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            current = version() if version else None
+            key = _view_cache_key(request)
+            entry = cache.get(key)
+            fresh = (entry is not None and entry['version'] == current
+                     and entry['expires'] > time.time())
+            if fresh and not _refresh_early(entry, beta):
+                return _serve(request, entry, 'hit')
+            lease_key = f'{key}.lease'
+            lease = _setting(lease_timeout, 'FEED_CACHE_LEASE_TIMEOUT')
+            _require_atomic_add()
+            if cache.add(lease_key, True, lease):
+                try:
+                    return _render_and_store(view, request, args, kwargs,
+                                             key, current, timeout,
+                                             stale_timeout)
+                finally:
+                    cache.delete(lease_key)
+            if entry is not None:
+                # перестраивает другой запрос — отдаём, что есть
+                return _serve(request, entry, 'hit' if fresh else 'stale')
+            entry = _wait_for_entry(key, current, lease)
+            if entry is not None:
+                return _serve(request, entry, 'hit')
+            return _render_and_store(view, request, args, kwargs, key,
+                                     current, timeout, stale_timeout)
+        return wrapper
+    return decorator
+
+
+def _require_atomic_add():
+    # без атомарного add аренду выиграют все одновременные запросы разом
+    if not has_atomic_add(caches[DEFAULT_CACHE_ALIAS]):
+        raise ImproperlyConfigured(
+            'cached_view нужен кэш по умолчанию с атомарным add: '
+            'core.cache.backends.TwoTierCache, Memcached или Redis')
+
+
+def _serve(request, entry, status):
+    request.cache_status = status
+    # для conditional_page: копия могла быть прочитана с реплики
+    request.replica_read_at = entry.get('replica_read_at')
+    return entry['response']
+
+
+def _setting(value, name):
+    return getattr(settings, name) if value is None else value
+
+
+def _view_cache_key(request):
+    # как Vary: Cookie у cache_page: у каждого набора кук своя копия
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    cookies = hashlib.md5(
+        request.META.get('HTTP_COOKIE', '').encode()).hexdigest()
+    return f'view.{url}.{cookies}'
+
+
+def _refresh_early(entry, beta):
+    # -log(u) при u из (0, 1] — экспоненциальная случайная величина
+    gap = -entry['delta'] * beta * math.log(1 - random.random())
+    return time.time() + gap >= entry['expires']
+
+
+def _wait_for_entry(key, current, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(LEASE_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None and entry['version'] == current:
+            return entry
+    return None
+
+
+def _render_and_store(view, request, args, kwargs, key, current, timeout,
+                      stale_timeout):
+    timeout = _setting(timeout, 'FEED_CACHE_TIMEOUT')
+    started = time.perf_counter()
+    response = view(request, *args, **kwargs)
+    delta = time.perf_counter() - started
+    request.cache_status = 'miss'
+    patch_vary_headers(response, ('Cookie',))
+    # срок хранения в кэше сервера клиенту не сообщаем: ленту сбрасывают
+    # сигналы, и браузер должен каждый раз переспрашивать сервер; страницы
+    # вошедшего пользователя общим прокси не достаются
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, max_age=0)
+    else:
+        patch_cache_control(response, max_age=0)
+    # read_from_replica внутри вью отмечает чтение с реплики; такая
+    # страница может не содержать последних изменений, хотя хранится под
+    # новой версией, поэтому живёт не дольше допустимого отставания реплики
+    replica_read_at = getattr(request, 'replica_read_at', None)
+    if replica_read_at is not None:
+        timeout = min(timeout, settings.REPLICA_PIN_SECONDS)
+    if response.status_code == 200 and not response.streaming:
+        cache.set(key, {
+            'response': response,
+            'version': current,
+            'expires': time.time() + timeout,
+            'delta': delta,
+            'replica_read_at': replica_read_at,
+        }, timeout + _setting(stale_timeout, 'FEED_CACHE_STALE_TIMEOUT'))
+    return response
+
+
+def _replica_behind(request, versions):
+    """Страницу читали с реплики раньше, чем через допустимое отставание
+    после последнего изменения её областей."""
+    read_at = getattr(request, 'replica_read_at', None)
+    return (read_at is not None
+            and read_at * 1000 - max(versions)
+            < settings.REPLICA_PIN_SECONDS * 1000)
+
+
+def cache_feed(view):
+    """Кэширует ленту до первого изменения постов, групп, комментариев
+    или подписок.
+
+    Версия ленты хранится вместе со страницей: после её увеличения
+    сигналом страница считается устаревшей и перестраивается одним
+    запросом, остальные на это время получают прежнюю копию.
+    Vary: Cookie ставится на сам ответ вью: SessionMiddleware добавляет его
+    уже после кэширования, и без этого страница одного пользователя
+    отдавалась бы всем остальным.
+    """
+    return cached_view(version=get_feed_version)(view)
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    """Версии областей вроде 'group:1', 'author:2', 'post:3'.
+
+    Версия — время последнего изменения в миллисекундах, поэтому из неё
+    же получается Last-Modified. Вытесненная из кэша версия заводится
+    заново текущим временем и только сбрасывает валидаторы клиентов.
+    """
+    keys = [SCOPE_VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = _now_ms()
+        for key in missing:
+            cache.add(key, now, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def version_time(*versions):
+    """Время последнего изменения по версиям областей — для
+    Last-Modified."""
+    return datetime.fromtimestamp(max(versions) / 1000, tz=timezone.utc)
+
+
+def bump_versions(*scopes):
+    keys = [SCOPE_VERSION_KEY.format(scope) for scope in scopes]
+    current = cache.get_many(keys)
+    now = _now_ms()
+    # +1 на случай двух изменений в одну миллисекунду
+    cache.set_many({key: max(now, current.get(key, 0) + 1)
+                    for key in keys}, None)
+
+
+def bump_all_versions():
+    """Сбрасывает версии всех страниц и ленту — после массовых изменений
+    в обход сигналов, когда затронутые области не перечислить."""
+    bump_versions(ALL_SCOPE)
+    bump_feed_version()
+
+
+def bump_post_versions(post_id, author_id, *group_ids):
+    """Сбрасывает версии всех страниц, на которых виден пост."""
+    scopes = [f'post:{post_id}', f'author:{author_id}']
+    scopes.extend(f'group:{group_id}' for group_id in set(group_ids)
+                  if group_id)
+    bump_versions(*scopes)
+
+
+def conditional_page(get_scopes):
+    """ETag и Last-Modified по версиям областей страницы, 304 без запуска
+    вью, и заголовки, с которыми обратный прокси может кэшировать
+    анонимные ответы. Вошедшим пользователям — только ETag, зависящий и
+    от их CSRF-токена.
+
+    get_scopes(**kwargs) получает аргументы из URL и возвращает список
+    областей или None, если объекта нет, — тогда 404 отдаст сама вью.
+    К областям страницы всегда добавляется ALL_SCOPE.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scopes = get_scopes(**kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            versions = get_versions(*scopes, ALL_SCOPE)
+            # страница зависит и от того, кто смотрит: кнопки подписки,
+            # ссылки на редактирование, форма комментария
+            parts = versions + [request.user.pk or 0]
+            last_modified = version_time(*versions)
+            if request.user.is_authenticated:
+                # в формах вошедшего пользователя CSRF-токен, а он
+                # меняется при каждом входе: старая страница с прежним
+                # токеном не должна получать 304. По времени это не
+                # проверить, поэтому Last-Modified таким страницам не нужен.
+                # get_token() заводит токен, если куки ещё нет, — тот же,
+                # что потом попадёт в форму
+                get_token(request)
+                parts.append(hashlib.md5(
+                    request.META['CSRF_COOKIE'].encode()).hexdigest()[:8])
+                last_modified = None
+            etag = '-'.join(map(str, parts))
+            response = condition(
+                etag_func=lambda *a, **kw: etag,
+                last_modified_func=lambda *a, **kw: last_modified,
+            )(view)(request, *args, **kwargs)
+            # cache_page ставит max-age на весь срок кэша, а браузер
+            # должен каждый раз переспрашивать сервер
+            del response['Expires']
+            if (getattr(request, 'cache_status', None) == 'stale'
+                    or _replica_behind(request, versions)):
+                # cached_view отдал старую копию, пока страницу
+                # перестраивает другой запрос, или страница прочитана с
+                # реплики, которая могла ещё не получить последние
+                # изменения: с новым ETag клиент получал бы на неё 304,
+                # пока страница снова не изменится
+                del response['ETag']
+                del response['Last-Modified']
+                patch_cache_control(response, no_store=True, max_age=0)
+            elif request.user.is_authenticated:
+                patch_cache_control(response, private=True, max_age=0)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=0,
+                    s_maxage=settings.PAGE_SHARED_MAX_AGE)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
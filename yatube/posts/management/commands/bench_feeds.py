@@ -0,0 +1,102 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+
+
+def percentile(values, share):
+    """Значение по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1,
+                       round(share * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = ('Гоняет ленты и страницу поста через тестовый клиент и '
+            'печатает p50/p99 времени ответа и число SQL-запросов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на каждую вью')
+        parser.add_argument('--warm', action='store_true',
+                            help='Не сбрасывать кэш перед запросами')
+        parser.add_argument('--max-p99', type=float,
+                            help='Порог p99 в мс, выше — ошибка')
+        parser.add_argument('--max-queries', type=int,
+                            help='Порог числа запросов, выше — ошибка')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        reader = (User.objects.annotate(following_total=Count('follower'))
+                  .order_by('-following_total').first())
+        if reader is None or not Post.objects.exists():
+            raise CommandError('Нет данных, сначала запустите generate_data')
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(reader)
+        urls = self.urls(rnd, options['requests'])
+        failures = []
+        self.stdout.write(f'{"вью":<14}{"p50 мс":>9}{"p99 мс":>9}'
+                          f'{"запросы p50":>13}{"max":>6}')
+        for name, view_urls in urls.items():
+            timings, queries = [], []
+            for url in view_urls:
+                if not options['warm']:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{url} ответил {response.status_code}')
+                queries.append(len(captured))
+            p99 = percentile(timings, 0.99)
+            self.stdout.write(
+                f'{name:<14}{percentile(timings, 0.5):>9.1f}{p99:>9.1f}'
+                f'{percentile(queries, 0.5):>13}{max(queries):>6}')
+            if options['max_p99'] is not None and p99 > options['max_p99']:
+                failures.append(f'{name}: p99 {p99:.1f} мс')
+            if (options['max_queries'] is not None
+                    and max(queries) > options['max_queries']):
+                failures.append(f'{name}: {max(queries)} запросов')
+        if failures:
+            raise CommandError('Превышены пороги: ' + ', '.join(failures))
+
+    def urls(self, rnd, count):
+        post_ids = list(Post.objects.values_list('pk', flat=True)[:10000])
+        slugs = list(Group.objects.values_list('slug', flat=True)[:1000])
+        # профили берём среди тех, у кого есть посты
+        usernames = list(User.objects.filter(
+            stats__posts_count__gt=0).values_list(
+                'username', flat=True)[:1000])
+        pages = max(1, min(10, len(post_ids) // 10))
+
+        def page():
+            return f'?page={rnd.randint(1, pages)}'
+
+        urls = {
+            'index': [reverse('posts:index') + page()
+                      for _ in range(count)],
+            'profile': [reverse('posts:profile', args=[rnd.choice(usernames)])
+                        for _ in range(count)],
+            'post_detail': [reverse('posts:post_detail',
+                                    args=[rnd.choice(post_ids)])
+                            for _ in range(count)],
+            'follow_index': [reverse('posts:follow_index')
+                             for _ in range(count)],
+        }
+        if slugs:
+            urls['group_posts'] = [
+                reverse('posts:group_list', args=[rnd.choice(slugs)])
+                for _ in range(count)]
+        return urls
@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import get_template
+
+from posts.paginators import FeedPaginator
+from posts.utils import page_links
+
+# прежний вариант include: ссылка на каждую страницу ленты
+FULL_RANGE = (
+    '{% for i in page_obj.paginator.page_range %}'
+    '<li class="page-item"><a class="page-link" href="?page={{ i }}">'
+    '{{ i }}</a></li>{% endfor %}'
+)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет рендер блока пагинации для лент разной длины: '
+            'окно ссылок против ссылок на все страницы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[1000, 100000, 1000000],
+                            help='Число постов в ленте')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        include = get_template('posts/includes/paginator.html')
+        full_range = engines['django'].from_string(FULL_RANGE)
+        for size in options['sizes']:
+            paginator = FeedPaginator(range(size),
+                                      settings.CONSTANTA_POSTS_ON_PAGE)
+            page_obj = paginator.get_page(paginator.num_pages // 2)
+            page_obj.page_links = page_links(page_obj)
+            windowed = self.measure(
+                lambda: include.render({'page_obj': page_obj}),
+                options['repeat'])
+            full = self.measure(
+                lambda: full_range.render({'page_obj': page_obj}),
+                options['repeat'])
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{size} постов, {paginator.num_pages} страниц'))
+            for name, (seconds, length) in (('окно', windowed),
+                                            ('все страницы', full)):
+                self.stdout.write(
+                    f'  {name}: {seconds * 1000:.2f} мс, {length} байт')
+
+    @staticmethod
+    def measure(render, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            html = render()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(html.encode())
@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post, User
+from posts.search import LikeSearchBackend, get_backend
+
+SYLLABLES = ('ка', 'ло', 'ми', 'ту', 'ре', 'ша', 'но', 'ви', 'да', 'пу')
+
+
+def make_word(rnd):
+    return ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4)))
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск через индекс и через LIKE на сгенерированном '
+            'корпусе; данные создаются в транзакции и откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--words', type=int, default=5000,
+                            help='Размер словаря корпуса')
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        vocabulary = list({make_word(rnd)
+                           for _ in range(options['words'])})
+        with transaction.atomic():
+            self.fill(rnd, vocabulary, options['posts'])
+            queries = [rnd.choice(vocabulary)
+                       for _ in range(options['queries'])]
+            for backend in (get_backend(), LikeSearchBackend()):
+                self.measure(backend, queries)
+            transaction.set_rollback(True)
+
+    def fill(self, rnd, vocabulary, count):
+        author = User.objects.create_user(username='bench-search-author')
+        Post.objects.bulk_create(
+            (Post(author=author, text=' '.join(
+                rnd.choice(vocabulary) for _ in range(rnd.randint(5, 60))))
+             for _ in range(count)),
+            batch_size=500,
+        )
+        # bulk_create в SQLite не возвращает id, индекс собираем целиком
+        get_backend().rebuild()
+
+    def measure(self, backend, queries):
+        timings = []
+        found = 0
+        for query in queries:
+            started = time.perf_counter()
+            queryset = backend.search(Post.objects.all(), query)
+            found += queryset.count()
+            list(queryset[:10])
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        self.stdout.write(
+            f'{type(backend).__name__}: '
+            f'медиана {timings[len(timings) // 2] * 1000:.1f} мс, '
+            f'худший {timings[-1] * 1000:.1f} мс, '
+            f'найдено постов {found}')
@@ -0,0 +1,95 @@
+import inspect
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from core.template_warmup import warm_up_templates
+from posts import views
+from posts.models import Post
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+PROFILES = (
+    ('с диска, debug', True, LOADERS),
+    ('кэш, прогрет', False,
+     [('django.template.loaders.cached.Loader', LOADERS)]),
+)
+
+
+def capture_context(view, request, **kwargs):
+    """Шаблон и контекст, с которыми вью вызвала бы render().
+
+    Декораторы вью (кэш, условные ответы) пропускаются, сам рендер
+    подменяется, так что замеряется только шаблон.
+    """
+    captured = {}
+
+    def fake_render(request, template_name, context=None, **options):
+        captured.update(template_name=template_name, context=context)
+        return HttpResponse()
+
+    with mock.patch.object(views, 'render', fake_render):
+        inspect.unwrap(view)(request, **kwargs)
+    return captured['template_name'], captured['context']
+
+
+class Command(BaseCommand):
+    help = ('Замеряет рендер index.html, profile.html и post_detail.html: '
+            'загрузка с диска на каждый рендер против кэширующего '
+            'загрузчика с прогревом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author').order_by('-pk').first()
+        if post is None:
+            raise CommandError('Нет данных, сначала запустите generate_data')
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        request.session = {}
+        pages = [
+            capture_context(views.index, request),
+            capture_context(views.profile, request,
+                            username=post.author.username),
+            capture_context(views.post_detail, request, post_id=post.pk),
+        ]
+        self.stdout.write(f'{"шаблон":<24}' + ''.join(
+            f'{label:>18}' for label, _, _ in PROFILES))
+        results = {name: [] for name, _ in pages}
+        for label, debug, loaders in PROFILES:
+            backend = self.backend(debug, loaders)
+            warm_up_templates([backend])
+            for name, context in pages:
+                results[name].append(
+                    self.measure(backend, name, context, request,
+                                 options['repeat']))
+        for name, timings in results.items():
+            self.stdout.write(f'{name:<24}' + ''.join(
+                f'{ms:>15.2f} мс' for ms in timings))
+
+    @staticmethod
+    def backend(debug, loaders):
+        params = settings.TEMPLATES[0]
+        return DjangoTemplates({
+            'NAME': 'bench',
+            'DIRS': params['DIRS'],
+            'APP_DIRS': False,
+            'OPTIONS': dict(params['OPTIONS'], debug=debug, loaders=loaders),
+        })
+
+    @staticmethod
+    def measure(backend, name, context, request, repeat):
+        """Среднее время загрузки и рендера шаблона, мс."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            backend.get_template(name).render(context, request)
+        return (time.perf_counter() - started) / repeat * 1000
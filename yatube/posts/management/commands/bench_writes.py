@@ -0,0 +1,111 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test import override_settings
+
+from posts.models import Comment, Post, User
+
+# поведение SQLite без настройки: журнал отката и полная синхронизация
+DEFAULT_PRAGMAS = {'journal_mode': 'delete', 'synchronous': 'full'}
+
+
+class Command(BaseCommand):
+    help = ('Пишет посты и комментарии из нескольких потоков во временную '
+            'SQLite-базу с прагмами из SQLITE_PRAGMAS и без них и печатает '
+            'пропускную способность и число ошибок блокировки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200,
+                            help='Транзакций на поток')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Сравнение прагм имеет смысл только для SQLite')
+        from django.conf import settings
+
+        modes = (('по умолчанию', DEFAULT_PRAGMAS),
+                 ('SQLITE_PRAGMAS', settings.SQLITE_PRAGMAS))
+        self.stdout.write(f'{"прагмы":<16}{"запись/с":>10}{"p99 мс":>9}'
+                          f'{"блокировки":>12}')
+        for label, pragmas in modes:
+            with override_settings(SQLITE_PRAGMAS=pragmas), \
+                    self.scratch_database():
+                rate, p99, locked = self.run(options)
+            self.stdout.write(f'{label:<16}{rate:>10.0f}{p99:>9.1f}'
+                              f'{locked:>12}')
+
+    @contextmanager
+    def scratch_database(self):
+        """Подменяет базу default на пустой временный файл с миграциями."""
+        settings_dict = connections.databases['default']
+        original = settings_dict['NAME']
+        handle, name = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        connection.close()
+        settings_dict['NAME'] = name
+        try:
+            call_command('migrate', verbosity=0)
+            yield
+        finally:
+            connection.close()
+            settings_dict['NAME'] = original
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                if os.path.exists(name + suffix):
+                    os.remove(name + suffix)
+
+    def run(self, options):
+        authors = [User.objects.create_user(username=f'bench-writer-{i}')
+                   for i in range(options['threads'])]
+        post = Post.objects.create(text='Пост для комментариев',
+                                   author=authors[0])
+        connection.close()
+        timings = []
+        locked = []
+        lock = threading.Lock()
+
+        def worker(author, seed):
+            rnd = random.Random(seed)
+            own_timings, own_locked = [], 0
+            try:
+                for i in range(options['writes']):
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            if rnd.random() < 0.2:
+                                Post.objects.create(text=f'Пост {i}',
+                                                    author=author)
+                            else:
+                                Comment.objects.create(
+                                    post=post, author=author,
+                                    text=f'Комментарий {i}')
+                    except OperationalError:
+                        own_locked += 1
+                    own_timings.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+            with lock:
+                timings.extend(own_timings)
+                locked.append(own_locked)
+
+        threads = [threading.Thread(target=worker,
+                                    args=(author, options['seed'] + i))
+                   for i, author in enumerate(authors)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        timings.sort()
+        p99 = timings[max(0, round(0.99 * len(timings)) - 1)] * 1000
+        done = len(timings) - sum(locked)
+        return done / elapsed, p99, sum(locked)
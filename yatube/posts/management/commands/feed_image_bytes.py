@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Сколько байт картинок уходит на страницу главной ленты: '
+            'оригиналы против каждого варианта из POST_IMAGE_WIDTHS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1,
+                            help='Сколько первых страниц ленты учесть')
+
+    def handle(self, *args, **options):
+        per_page = settings.CONSTANTA_POSTS_ON_PAGE
+        images = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('image', flat=True)[:per_page * options['pages']])
+        images = [name for name in images if name]
+        ready = thumbnails.lookup_many(images)
+        original = 0
+        variants = {width: 0 for width, _, _ in thumbnails.renditions()}
+        missing = 0
+        for name in images:
+            original += _size(default_storage, name)
+            for width in variants:
+                if width in ready[name]:
+                    thumbnail = ready[name][width]
+                    variants[width] += _size(thumbnail.storage,
+                                             thumbnail.name)
+                else:
+                    missing += 1
+        pages = options['pages']
+        self.stdout.write(f'Картинок на {pages} стр.: {len(images)}')
+        self.stdout.write(f'Оригиналы: {original // pages} байт/стр.')
+        for width, size in variants.items():
+            self.stdout.write(
+                f'{width}w {settings.POST_IMAGE_FORMAT}: '
+                f'{size // pages} байт/стр.')
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f'Не построено вариантов: {missing}, '
+                f'запустите warm_thumbnails'))
+
+
+def _size(storage, name):
+    return storage.size(name) if storage.exists(name) else 0
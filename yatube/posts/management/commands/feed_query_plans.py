@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import NEXT, CursorPaginator
+
+
+def feed_queries():
+    """Запросы страниц лент в том виде, в каком их выполняют вью."""
+    per_page = settings.CONSTANTA_POSTS_ON_PAGE
+    group = Group.objects.first() or Group(pk=1)
+    user = User.objects.first() or User(pk=1)
+    post = Post.objects.first() or Post(pk=1, author=user)
+    feed = Post.objects.feed().order_by('-pub_date')
+    paginator = CursorPaginator(feed, per_page)
+    cursor = paginator.encode_cursor(NEXT, post)
+    return {
+        'index': feed[:per_page],
+        'index (cursor)': paginator.page_queryset(
+            *paginator.decode_cursor(cursor)),
+        'group_posts': feed.filter(group=group)[:per_page],
+        'profile': feed.filter(author=post.author_id)[:per_page],
+        'follow_index': feed.timeline(user)[:per_page],
+        'profile following': Follow.objects.filter(
+            user=user, author=post.author_id),
+        'post_detail comments': CursorPaginator(
+            Comment.objects.filter(post=post).select_related('author'),
+            settings.COMMENTS_ON_PAGE,
+            ordering=('created', 'id')).page_queryset(),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Печатает планы запросов лент, чтобы проверить, что они идут '
+            'по индексам')
+
+    def handle(self, *args, **options):
+        for name, queryset in feed_queries().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,186 @@
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+from PIL import Image
+
+from posts import timeline
+from posts.cache import bump_all_versions
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+from posts.search import get_backend
+
+BATCH_SIZE = 500
+WORDS = (
+    'утро', 'город', 'река', 'поезд', 'книга', 'кофе', 'дождь', 'горы',
+    'друзья', 'работа', 'музыка', 'море', 'кошка', 'лес', 'выходные',
+    'путешествие', 'фильм', 'осень', 'весна', 'дорога', 'закат', 'снег',
+)
+
+
+def batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def sentence(rnd, low, high):
+    return ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(low, high)))
+
+
+def spread_dates(queryset, field, days, rnd):
+    """Раскидывает даты по последним days дням: bulk_create ставит всем
+    записям одно и то же время из auto_now_add."""
+    now = timezone.now()
+    pks = list(queryset.values_list('pk', flat=True))
+    for chunk in batches(pks):
+        queryset.filter(pk__in=chunk).update(**{field: Case(
+            *[When(pk=pk, then=Value(
+                now - timedelta(seconds=rnd.randint(0, days * 86400))))
+              for pk in chunk],
+            output_field=queryset.model._meta.get_field(field),
+        )})
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу объёмными тестовыми данными: пользователи, '
+            'группы, посты с картинками, комментарии и подписки со '
+            'степенным распределением подписчиков')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--images', type=float, default=0.2,
+                            help='Доля постов с картинкой')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней раскидать даты')
+        parser.add_argument('--prefix', default='gen',
+                            help='Префикс имён пользователей и слагов')
+        parser.add_argument('--seed', type=int, default=1)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        prefix = options['prefix']
+        user_ids = self.create_users(prefix, options['users'])
+        group_ids = self.create_groups(prefix, options['groups'])
+        follows = self.create_follows(rnd, user_ids, options['follows'])
+        images = self.create_images(rnd, prefix, options)
+        self.create_posts(rnd, user_ids, group_ids, images, options)
+        comments = self.create_comments(rnd, user_ids, options)
+
+        # bulk_create обходит сигналы, поэтому производные данные
+        # собираем целиком
+        UserStats.objects.recount()
+        Post.objects.recount_comments()
+        timeline.rebuild()
+        get_backend().rebuild()
+        transaction.on_commit(bump_all_versions)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, групп: {len(group_ids)}, '
+            f'постов: {options["posts"]}, комментариев: {comments}, '
+            f'подписок: {follows}'))
+
+    def create_users(self, prefix, count):
+        password = make_password(None)
+        User.objects.bulk_create(
+            (User(username=f'{prefix}_user_{i}', password=password,
+                  first_name='Пользователь', last_name=str(i))
+             for i in range(count)),
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        user_ids = list(User.objects.filter(
+            username__startswith=f'{prefix}_user_').values_list(
+                'pk', flat=True))
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=user_id) for user_id in user_ids),
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        return user_ids
+
+    def create_groups(self, prefix, count):
+        Group.objects.bulk_create(
+            (Group(title=f'Группа {i}', slug=f'{prefix}-group-{i}',
+                   description=f'Сгенерированная группа {i}')
+             for i in range(count)),
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        return list(Group.objects.filter(
+            slug__startswith=f'{prefix}-group-').values_list(
+                'pk', flat=True))
+
+    def create_follows(self, rnd, user_ids, average):
+        # у автора на месте rank в рейтинге вес 1 / rank: немного
+        # знаменитостей и длинный хвост почти без подписчиков
+        authors = user_ids[:]
+        rnd.shuffle(authors)
+        weights = [1 / rank for rank in range(1, len(authors) + 1)]
+        pairs = set()
+        for user_id in user_ids:
+            count = min(rnd.randint(0, average * 2), len(authors) - 1)
+            for author_id in rnd.choices(authors, weights, k=count):
+                if author_id != user_id:
+                    pairs.add((user_id, author_id))
+        Follow.objects.bulk_create(
+            (Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in pairs),
+            batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        return len(pairs)
+
+    def create_images(self, rnd, prefix, options):
+        """Небольшой набор картинок, которые делят между собой посты."""
+        if not options['images'] or not options['posts']:
+            return []
+        names = []
+        for i in range(min(20, options['posts'])):
+            color = tuple(rnd.randint(0, 255) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', (1280, 720), color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/{prefix}_{i}.jpg', ContentFile(buffer.getvalue())))
+        return names
+
+    def create_posts(self, rnd, user_ids, group_ids, images, options):
+        def build():
+            image = ''
+            if images and rnd.random() < options['images']:
+                image = rnd.choice(images)
+            group_id = None
+            if group_ids and rnd.random() < 0.5:
+                group_id = rnd.choice(group_ids)
+            return Post(text=sentence(rnd, 5, 80),
+                        author_id=rnd.choice(user_ids),
+                        group_id=group_id, image=image)
+
+        Post.objects.bulk_create(
+            (build() for _ in range(options['posts'])),
+            batch_size=BATCH_SIZE,
+        )
+        spread_dates(Post.objects.filter(author_id__in=user_ids),
+                     'pub_date', options['days'], rnd)
+
+    def create_comments(self, rnd, user_ids, options):
+        post_ids = list(Post.objects.filter(
+            author_id__in=user_ids).values_list('pk', flat=True))
+        if not post_ids:
+            return 0
+        Comment.objects.bulk_create(
+            (Comment(post_id=rnd.choice(post_ids),
+                     author_id=rnd.choice(user_ids),
+                     text=sentence(rnd, 3, 30))
+             for _ in range(options['comments'])),
+            batch_size=BATCH_SIZE,
+        )
+        spread_dates(Comment.objects.filter(author_id__in=user_ids),
+                     'created', options['days'], rnd)
+        return options['comments']
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.cache import bump_all_versions
+from posts.models import Post, User, UserStats
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает с нуля счётчики постов, подписчиков, подписок '
+            'и комментариев')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        missing = User.objects.filter(stats__isnull=True)
+        UserStats.objects.bulk_create(
+            UserStats(user_id=user_id)
+            for user_id in missing.values_list('pk', flat=True)
+        )
+        users = UserStats.objects.recount()
+        posts = Post.objects.recount_comments()
+        # счётчики видны в профилях и карточках постов
+        transaction.on_commit(bump_all_versions)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, постов: {posts}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = ('Снова раскладывает по лентам посты авторов, у которых '
+            'подписчиков стало меньше TIMELINE_FANOUT_RESUME; '
+            'запускается по расписанию')
+
+    def handle(self, *args, **options):
+        resumed = timeline.resume()
+        self.stdout.write(self.style.SUCCESS(
+            f'Раскладка возобновлена для авторов: {resumed}'))
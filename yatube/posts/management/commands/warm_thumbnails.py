@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заранее строит варианты картинок для всех постов'
+
+    def handle(self, *args, **options):
+        images = (Post.objects.exclude(image='')
+                  .values_list('image', flat=True).distinct())
+        total = len(thumbnails.renditions())
+        built = 0
+        for name in images.iterator():
+            if len(thumbnails.lookup_many([name])[name]) < total:
+                thumbnails.generate(name)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Построено миниатюр: {built}'))
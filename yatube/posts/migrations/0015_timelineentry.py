@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    """Раскладывает посты по лентам подписчиков одним INSERT ... SELECT.
+
+    Авторов с числом подписчиков больше TIMELINE_FANOUT_LIMIT пропускаем:
+    их посты лента дочитывает при запросе.
+    """
+    quote = schema_editor.quote_name
+    follow, post, entry, stats = (
+        quote(apps.get_model('posts', name)._meta.db_table)
+        for name in ('Follow', 'Post', 'TimelineEntry', 'UserStats'))
+    schema_editor.execute(
+        f'INSERT INTO {entry} (user_id, post_id) '
+        f'SELECT {follow}.user_id, {post}.id FROM {follow} '
+        f'INNER JOIN {post} ON {post}.author_id = {follow}.author_id '
+        f'WHERE NOT EXISTS (SELECT 1 FROM {stats} '
+        f'WHERE {stats}.user_id = {follow}.author_id '
+        f'AND {stats}.followers_count > %s)',
+        [settings.TIMELINE_FANOUT_LIMIT]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_auto_20261018_2241'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты подписок',
+                'verbose_name_plural': 'Записи лент подписок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='uniq_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
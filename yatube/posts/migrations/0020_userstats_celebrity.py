@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-19 11:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_celebrity(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).update(celebrity=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_timelineentry_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='celebrity',
+            field=models.BooleanField(
+                default=False,
+                verbose_name='Посты читаются при запросе ленты'),
+        ),
+        migrations.RunPython(fill_celebrity, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,24 @@
 from django.contrib.auth import get_user_model
 from django.db import models
-from django.db.models import UniqueConstraint
+from django.db.models import Count, F, OuterRef, Subquery, UniqueConstraint
+from django.db.models.functions import Coalesce, Greatest
 
 User = get_user_model()
 
+# сортировка ленты подписок по полям, которые проставляет
+# PostQuerySet.timeline(): так страница читается по индексу записей ленты
+TIMELINE_ORDERING = ('-feed_date', '-feed_id')
+
+
+def count_related(model, field, outer='pk'):
+    """Подзапрос с числом строк model, ссылающихся на внешнюю запись."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by().values(field).annotate(count=Count('pk'))
+        .values('count'),
+        output_field=models.PositiveIntegerField()
+    ), 0)
+
 
 class Group(models.Model):
     title = models.CharField("Название группы", max_length=200,
@@ -20,11 +35,69 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'text', 'pub_date', 'updated_at', 'image', 'author', 'group',
+        'comments_count', 'author__username', 'author__first_name',
+        'author__last_name', 'group__title', 'group__slug',
+    )
+
+    def feed(self):
+        """Посты для ленты: автор и группа одним запросом, без лишних полей."""
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+    def timeline(self, user):
+        """Посты авторов, на которых подписан user, в порядке
+        TIMELINE_ORDERING.
+
+        Обычные авторы раскладывают посты по лентам подписчиков при
+        публикации, и страница читается по индексу записей ленты. Посты
+        авторов с огромным числом подписчиков дочитываются из их таблицы в
+        момент запроса — для тех, кто на них подписан, ленту приходится
+        сортировать целиком.
+        """
+        celebrities = list(Follow.objects.filter(
+            user=user, author__stats__celebrity=True
+        ).values_list('author_id', flat=True))
+        if celebrities:
+            entries = TimelineEntry.objects.filter(
+                user=user).values('post_id')
+            queryset = self.filter(
+                models.Q(pk__in=entries)
+                | models.Q(author_id__in=celebrities)
+            ).annotate(feed_date=F('pub_date'), feed_id=F('id'))
+        else:
+            queryset = self.filter(timeline_entries__user=user).annotate(
+                feed_date=F('timeline_entries__pub_date'),
+                feed_id=F('timeline_entries__post_id'))
+        return queryset.order_by(*TIMELINE_ORDERING)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create не шлёт сигналов, поэтому счётчики авторов, ленты
+        # подписчиков и поисковый индекс обновляем здесь же
+        from .search import get_backend
+        from .timeline import fan_out
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        per_author = {}
+        for post in objs:
+            per_author[post.author_id] = per_author.get(post.author_id, 0) + 1
+        for author_id, count in per_author.items():
+            UserStats.objects.bump(author_id, posts_count=count)
+        fan_out(objs)
+        get_backend().index(objs)
+        return objs
+
+    def recount_comments(self):
+        return self.update(comments_count=count_related(Comment, 'post'))
+
+
 class Post(models.Model):
     text = models.TextField('Текст', help_text='Поле ввода текста')
     pub_date = models.DateTimeField('Дата публикации',
-                                    auto_now_add=True,
-                                    db_index=True)
+                                    auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True,
+                                      db_index=True)
     author = models.ForeignKey(User, verbose_name='Автор',
                                on_delete=models.CASCADE,
                                related_name='posts')
@@ -38,11 +111,23 @@ class Post(models.Model):
         blank=True,
         help_text='Изображение, которое относится к посту'
     )
+    comments_count = models.PositiveIntegerField('Число комментариев',
+                                                 default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -58,11 +143,17 @@ class Comment(models.Model):
     text = models.TextField('Текст', help_text='Поле ввода комментария')
     created = models.DateTimeField('Дата и время публикации комментария',
                                    auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True,
+                                      db_index=True)
 
     class Meta:
-        ordering = ('post',)
+        ordering = ('created',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -79,5 +170,91 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Фалловер'
         verbose_name_plural = 'Фалловеры'
-        UniqueConstraint(fields=['user', 'author'],
-                         name='uniq_follow_following')
+        constraints = [
+            UniqueConstraint(fields=['user', 'author'],
+                             name='uniq_follow_following'),
+        ]
+
+
+class UserStatsQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Счётчики пользователя; недостающая строка создаётся пересчётом,
+        а не с нулями."""
+        stats, created = self.get_or_create(user=user)
+        if created:
+            self.filter(pk=stats.pk).recount()
+            stats.refresh_from_db()
+        return stats
+
+    def bump(self, user_id, **deltas):
+        """Атомарно сдвигает счётчики пользователя на deltas.
+
+        Если строки со счётчиками ещё нет, при росте счётчиков она
+        создаётся пересчётом с нуля; при уменьшении ничего не делаем —
+        так удаление пользователя каскадом не создаёт строку заново.
+        """
+        updated = self.filter(user_id=user_id).update(
+            **{field: Greatest(F(field) + delta, 0)
+               for field, delta in deltas.items()})
+        if not updated and any(delta > 0 for delta in deltas.values()):
+            self.get_or_create(user_id=user_id)
+            self.filter(user_id=user_id).recount()
+
+    def recount(self):
+        return self.update(
+            posts_count=count_related(Post, 'author', 'user'),
+            followers_count=count_related(Follow, 'author', 'user'),
+            following_count=count_related(Follow, 'user', 'user'),
+        )
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User, verbose_name='Пользователь',
+                                on_delete=models.CASCADE, primary_key=True,
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField('Число подписчиков',
+                                                  default=0)
+    following_count = models.PositiveIntegerField('Число подписок',
+                                                  default=0)
+    # посты не раскладываются по лентам, а дочитываются при запросе;
+    # флаг ставится при превышении TIMELINE_FANOUT_LIMIT и снимается
+    # командой resume_fanout, когда подписчиков становится меньше
+    # TIMELINE_FANOUT_RESUME
+    celebrity = models.BooleanField('Посты читаются при запросе ленты',
+                                    default=False)
+
+    objects = UserStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, verbose_name='Подписчик',
+                             on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, verbose_name='Пост',
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    # копия Post.pub_date, чтобы страница ленты читалась по индексу
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+        constraints = [
+            UniqueConstraint(fields=['user', 'post'],
+                             name='uniq_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} ← {self.post}'
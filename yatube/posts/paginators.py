@@ -0,0 +1,171 @@
+import base64
+import binascii
+import datetime as dt
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class FeedPaginator(Paginator):
+    """Paginator с окном ссылок на страницы вместо полного page_range.
+
+    Повторяет get_elided_page_range() из Django 3.2, которого нет в 2.2.
+    """
+    ELLIPSIS = '…'
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CursorPage(Page):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(NEXT, self.object_list[-1])
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(PREVIOUS, self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация: страница ищется по значениям полей сортировки
+    последней показанной записи, без OFFSET и без COUNT(*).
+
+    Сортировка обязана быть уникальной, поэтому последним полем идёт id.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 with_count=False):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.with_count = with_count
+
+    @cached_property
+    def count(self):
+        if not self.with_count:
+            return None
+        return super().count
+
+    @cached_property
+    def fields(self):
+        return [(name.lstrip('-'), name.startswith('-'))
+                for name in self.ordering]
+
+    def encode_cursor(self, direction, obj):
+        values = [self._serialize(getattr(obj, name))
+                  for name, _ in self.fields]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if (direction not in (NEXT, PREVIOUS)
+                    or len(values) != len(self.fields)):
+                raise InvalidCursor(cursor)
+            return direction, [
+                self._field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _field(self, name):
+        """Поле модели или аннотации запроса, по которому идёт сортировка."""
+        try:
+            return self.object_list.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.object_list.query.annotations[name].output_field
+
+    def get_page(self, cursor=None):
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+        backwards = direction == PREVIOUS
+        object_list = list(self.page_queryset(direction, values))
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backwards:
+            object_list.reverse()
+            return CursorPage(object_list, self,
+                              has_next=True, has_previous=has_more)
+        return CursorPage(object_list, self,
+                          has_next=has_more, has_previous=values is not None)
+
+    def page_queryset(self, direction=NEXT, values=None):
+        """Запрос страницы с лишней записью для проверки следующей."""
+        backwards = direction == PREVIOUS
+        queryset = self.object_list.order_by(*self._ordering(backwards))
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        return queryset[:self.per_page + 1]
+
+    def _ordering(self, backwards):
+        return [('-' if desc != backwards else '') + name
+                for name, desc in self.fields]
+
+    def _seek(self, values, backwards):
+        condition = Q()
+        for i, (name, desc) in enumerate(self.fields):
+            lookup = 'lt' if desc != backwards else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for (prev_name, _), prev_value in zip(self.fields[:i], values):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    @staticmethod
+    def _serialize(value):
+        if isinstance(value, (dt.datetime, dt.date)):
+            return value.isoformat()
+        return value
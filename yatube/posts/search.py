@@ -0,0 +1,103 @@
+"""Полнотекстовый поиск по постам.
+
+Поиск идёт через бэкенд из настройки POSTS_SEARCH_BACKEND. Бэкенд держит
+свой индекс в актуальном состоянии по сигналам Post (index/remove) и
+возвращает queryset постов, отсортированный по релевантности. Для другой
+базы достаточно написать класс с теми же методами.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+WORD_RE = re.compile(r'\w+')
+
+
+def terms(query):
+    return WORD_RE.findall(query or '')
+
+
+class LikeSearchBackend:
+    """Поиск через LIKE '%...%' без индекса, работает на любой базе."""
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, query):
+        words = terms(query)
+        if not words:
+            return queryset.none()
+        for word in words:
+            queryset = queryset.filter(text__icontains=word)
+        return queryset.order_by('-pub_date', '-id')
+
+
+class SQLiteFTSBackend:
+    """Инвертированный индекс в FTS5-таблице SQLite с ранжированием bm25.
+
+    Таблица создаётся миграцией, rowid в ней совпадает с id поста.
+    """
+    table = 'posts_post_fts'
+
+    def index(self, posts):
+        rows = [(post.pk, post.text) for post in posts if post.pk]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(pk,) for pk, _ in rows])
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, text) VALUES (%s, %s)',
+                rows)
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(pk,) for pk in post_ids])
+
+    def rebuild(self):
+        from .models import Post
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, text) '
+                f'SELECT id, text FROM {Post._meta.db_table}')
+
+    def search(self, queryset, query):
+        words = terms(query)
+        if not words:
+            return queryset.none()
+        # каждое слово в кавычках, чтобы пользовательский ввод не
+        # разбирался как синтаксис FTS5; звёздочка — поиск по префиксу
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.extra(
+            tables=[self.table],
+            where=[f'{self.table}.rowid = {queryset.model._meta.db_table}.id',
+                   f'{self.table} MATCH %s'],
+            params=[match],
+            select={'rank': f'bm25({self.table})'},
+            order_by=['rank', '-id'],
+        )
+
+
+def get_backend():
+    return import_string(settings.POSTS_SEARCH_BACKEND)()
+
+
+def search_posts(query, queryset=None):
+    """Посты по запросу, самые релевантные первыми."""
+    if queryset is None:
+        from .models import Post
+
+        queryset = Post.objects.all()
+    return get_backend().search(queryset, query)
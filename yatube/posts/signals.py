@@ -0,0 +1,141 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_feed_version, bump_post_versions, bump_versions
+from . import search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_version()
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    # пост могли перенести в другую группу, её страница тоже меняется
+    if not instance._state.adding and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    bump_post_versions(instance.pk, instance.author_id, instance.group_id,
+                       getattr(instance, '_previous_group_id', None))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_page(sender, instance, **kwargs):
+    bump_versions(f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    # счётчик комментариев виден и в карточках лент группы и автора
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is not None:
+        bump_post_versions(instance.post_id, *post)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    bump_versions(f'author:{instance.user_id}',
+                  f'author:{instance.author_id}')
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile_page(sender, instance, created=False,
+                            update_fields=None, **kwargs):
+    scopes = [f'author:{instance.pk}']
+    # у нового пользователя постов нет, а вход обновляет только
+    # last_login, которого на страницах нет
+    login = update_fields is not None and set(update_fields) == {
+        'last_login'}
+    if not created and not login:
+        # имя автора есть в карточках его постов в группах и в лентах
+        scopes.extend(
+            f'group:{group_id}' for group_id in Post.objects.filter(
+                author=instance, group__isnull=False
+            ).values_list('group_id', flat=True).distinct())
+        bump_feed_version()
+    bump_versions(*scopes)
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnails(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        thumbnails.schedule(instance.image)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.bump(instance.author_id, posts_count=1)
+        timeline.fan_out([instance])
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    UserStats.objects.bump(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1, updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=Greatest(F('comments_count') - 1, 0),
+        updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.bump(instance.user_id, following_count=1)
+        UserStats.objects.bump(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    UserStats.objects.bump(instance.user_id, following_count=-1)
+    UserStats.objects.bump(instance.author_id, followers_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.get_backend().index([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove([instance.pk])
@@ -0,0 +1,25 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image_url(post):
+    """URL миниатюры картинки поста, а пока её нет — URL оригинала.
+
+    Если посты страницы уже прошли через thumbnails.attach(), берётся
+    готовый post.image_url без обращения к хранилищу.
+    """
+    url = getattr(post, 'image_url', None)
+    if url is not None:
+        return url
+    image = post.image
+    if not image:
+        return ''
+    thumbnail = thumbnails.lookup(image)
+    if thumbnail is not None:
+        return thumbnail.url
+    thumbnails.schedule(image)
+    return image.url
@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..cache import _now_ms
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api-author')
+        cls.reader = User.objects.create_user(username='api-reader')
+        cls.group = Group.objects.create(title='API', slug='api-group',
+                                         description='Группа для API')
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_feeds_are_paginated_by_cursor(self):
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', kwargs={'slug': self.group.slug}),
+            reverse('api:profile', kwargs={'username': self.author}),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0]['text'], 'Пост 11')
+                data = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual([p['text'] for p in data['results']],
+                                 ['Пост 1', 'Пост 0'])
+                self.assertIsNone(data['next'])
+
+    def test_unchanged_feed_answers_304(self):
+        url = reverse('api:index')
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        post = Post.objects.filter(author=self.author).first()
+        post.text = 'Изменённый пост'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_changes_on_delete(self):
+        """Удаление поста сдвигает Last-Modified, хотя MAX(updated_at)
+        оставшихся постов не меняется"""
+        url = reverse('api:index')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        # заголовок с точностью до секунды, поэтому удаляем «позже»
+        with mock.patch('posts.cache._now_ms',
+                        return_value=_now_ms() + 2000):
+            Post.objects.filter(author=self.author).first().delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_post_detail(self):
+        post = Post.objects.filter(author=self.author).first()
+        url = reverse('api:post_detail', kwargs={'post_id': post.pk})
+        data = self.client.get(url).json()
+        self.assertEqual(data['id'], post.pk)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(data['author'], self.author.username)
+
+    def test_errors_are_json(self):
+        url = reverse('api:group_list', kwargs={'slug': 'missing'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        response = Client().get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('detail', response.json())
+
+    def test_since_returns_changed_posts(self):
+        url = reverse('api:index')
+        since = Post.objects.order_by('-updated_at').first().updated_at
+        self.assertEqual(
+            self.client.get(url, {'since': since.isoformat()}).json()[
+                'results'], [])
+        post = Post.objects.order_by('pub_date').first()
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        edited = Post.objects.order_by('pub_date')[1]
+        edited.text = 'Правка'
+        edited.save()
+        data = self.client.get(url, {'since': since.isoformat()}).json()
+        self.assertEqual([p['id'] for p in data['results']],
+                         [post.pk, edited.pk])
+        response = self.client.get(url, {'since': 'вчера'})
+        self.assertEqual(response.status_code, 400)
@@ -1,9 +1,19 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ImproperlyConfigured
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Group, Post
+from ..cache import _refresh_early, _view_cache_key, get_feed_version
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -31,10 +41,11 @@ class CacheWorkTest(TestCase):
         cache.clear()
 
     def test_index_page_cached(self):
-        """Проверка работы кэша на главной странице"""
+        """Пока лента не менялась, главная страница отдаётся из кэша"""
         response = self.authorized_client.get(reverse('posts:index'))
         first = response.content
-        self.post.delete()
+        # update() не шлёт сигналов, поэтому кэш остаётся прежним
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
 
         response_check = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(first, response_check.content)
@@ -42,3 +53,178 @@ class CacheWorkTest(TestCase):
         cache.clear()
         response_second = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(first, response_second.content)
+
+    def test_index_cache_invalidated_on_change(self):
+        """Изменения постов, групп и комментариев сразу видны в ленте"""
+        response = self.authorized_client.get(reverse('posts:index'))
+        first = response.content
+        self.group.title = 'Переименованная группа'
+        self.group.save()
+        response_renamed = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(first, response_renamed.content)
+        self.assertContains(response_renamed, 'Переименованная группа')
+
+        post = Post.objects.create(text='Пост на удаление', author=self.user)
+        response_created = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response_created, 'Пост на удаление')
+        post.delete()
+        response_deleted = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response_deleted, 'Пост на удаление')
+
+    def test_feed_ttl_not_sent_to_browser(self):
+        """Браузер не держит ленту у себя, а переспрашивает сервер"""
+        for _ in range(2):
+            response = self.authorized_client.get(reverse('posts:index'))
+            self.assertIn('max-age=0', response['Cache-Control'])
+            self.assertIn('private', response['Cache-Control'])
+            self.assertFalse(response.has_header('Expires'))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn('private', response['Cache-Control'])
+        response = Client().get(reverse('posts:index'))
+        self.assertEqual(response['Cache-Control'], 'max-age=0')
+
+    def test_comment_bumps_feed_version(self):
+        version = get_feed_version()
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        self.assertNotEqual(get_feed_version(), version)
+
+
+class StampedeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='stampede-author')
+        Post.objects.create(text='Первый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:index')
+        lease_key = _view_cache_key(RequestFactory().get(self.url))
+        self.lease_key = f'{lease_key}.lease'
+
+    def test_stale_page_served_while_other_request_rebuilds(self):
+        """Пока страницу перестраивает другой запрос, отдаётся старая."""
+        Client().get(self.url)
+        Post.objects.create(text='Новый пост', author=self.user)
+        cache.add(self.lease_key, True)
+        response = Client().get(self.url)
+        self.assertNotContains(response, 'Новый пост')
+        self.assertIn('cache;desc=stale', response['Server-Timing'])
+        cache.delete(self.lease_key)
+        self.assertContains(Client().get(self.url), 'Новый пост')
+
+    @override_settings(FEED_CACHE_LEASE_TIMEOUT=0.1)
+    def test_miss_without_copy_waits_for_lease(self):
+        """Без старой копии запрос ждёт аренду и рендерит сам."""
+        cache.add(self.lease_key, True)
+        started = time.monotonic()
+        response = Client().get(self.url)
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertContains(response, 'Первый пост')
+
+    def test_lease_taken_by_one_of_concurrent_requests(self):
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.add(self.lease_key, 1)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+    def test_lease_needs_atomic_add(self):
+        """С кэшем без атомарного add аренда не исключительна — такой
+        кэш вью не принимает"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        files = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }
+        with override_settings(CACHES=dict(settings.CACHES, default=files)):
+            with self.assertRaises(ImproperlyConfigured):
+                Client().get(self.url)
+
+    def test_early_refresh_probability_grows_near_expiry(self):
+        now = time.time()
+        with mock.patch('posts.cache.random.random', return_value=0.5):
+            self.assertFalse(_refresh_early(
+                {'delta': 0.1, 'expires': now + 60}, beta=1.0))
+            self.assertTrue(_refresh_early(
+                {'delta': 0.1, 'expires': now + 0.01}, beta=1.0))
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='card-author')
+        cls.reader = User.objects.create_user(username='card-reader')
+        cls.group = Group.objects.create(
+            title='Группа карточек',
+            slug='cards',
+            description='test description'
+        )
+        cls.post = Post.objects.create(
+            text='Текст карточки',
+            author=cls.author,
+            group=cls.group,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.author, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_card_fragment_is_cached(self):
+        """Карточка поста попадает в кэш фрагментов"""
+        self.reader_client.get(reverse('posts:index'))
+        key = make_template_fragment_key(
+            'post_card', [self.post.pk, self.post.updated_at.isoformat(),
+                          '', '', self.post.author.username,
+                          self.group.title, self.group.slug, ''])
+        self.assertIn('Текст карточки', cache.get(key))
+
+    def test_username_change_refreshes_card(self):
+        """Ссылка на профиль в карточке следует за новым username"""
+        self.reader_client.get(reverse('posts:index'))
+        self.author.username = 'card-renamed'
+        self.author.save()
+        self.addCleanup(setattr, self.author, 'username', 'card-author')
+        response = self.reader_client.get(reverse('posts:index'))
+        self.assertContains(response, reverse(
+            'posts:profile', kwargs={'username': 'card-renamed'}))
+
+    def test_edit_link_rendered_outside_fragment(self):
+        """Ссылка на редактирование не попадает в общий кэш карточки"""
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        )
+        for url in feeds:
+            with self.subTest(url=url):
+                self.assertNotContains(self.reader_client.get(url), edit_url)
+                self.assertContains(self.author_client.get(url), edit_url)
+                self.assertNotContains(self.reader_client.get(url), edit_url)
+
+    def test_edit_refreshes_card(self):
+        """Правка поста меняет updated_at и ключ фрагмента карточки"""
+        self.reader_client.get(reverse('posts:index'))
+        updated_at = self.post.updated_at
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Исправленный текст', 'group': self.group.pk})
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.updated_at, updated_at)
+        self.assertContains(self.reader_client.get(reverse('posts:index')),
+                            'Исправленный текст')
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_ON_PAGE=10)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(text='Обсуждаемый пост',
+                                       author=cls.user)
+        cls.quiet = Post.objects.create(text='Тихий пост', author=cls.user)
+        for i in range(25):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {i}')
+        Comment.objects.create(post=cls.quiet, author=cls.user,
+                               text='Единственный')
+        cls.expected = list(cls.post.comments.order_by(
+            'created', 'id').values_list('text', flat=True))
+
+    def detail(self, post):
+        return reverse('posts:post_detail', kwargs={'post_id': post.pk})
+
+    def test_detail_shows_first_batch(self):
+        response = Client().get(self.detail(self.post))
+        comments = response.context['comments']
+        self.assertEqual([c.text for c in comments], self.expected[:10])
+        self.assertContains(response, 'data-comments-more')
+
+    def test_queries_do_not_depend_on_comments(self):
+        counts = []
+        for post in (self.quiet, self.post):
+            with CaptureQueriesContext(connection) as queries:
+                Client().get(self.detail(post))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_endpoint_returns_following_batches(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        cursor = Client().get(
+            self.detail(self.post)).context['comments'].next_cursor
+        response = Client().get(url, {'cursor': cursor})
+        self.assertEqual([c.text for c in response.context['comments']],
+                         self.expected[10:20])
+        self.assertNotContains(response, '<html')
+        cursor = response.context['comments'].next_cursor
+        data = Client().get(url, {'cursor': cursor, 'format': 'json'}).json()
+        self.assertEqual([c['text'] for c in data['comments']],
+                         self.expected[20:])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_endpoint_unknown_post(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': 10 ** 6})
+        self.assertEqual(Client().get(url).status_code, 404)
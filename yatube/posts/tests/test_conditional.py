@@ -0,0 +1,151 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from ..cache import _view_cache_key
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag-author',
+                                              password='password')
+        cls.group = Group.objects.create(title='Первая', slug='first',
+                                         description='Описание')
+        cls.other = Group.objects.create(title='Вторая', slug='second',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.user = Client()
+        self.user.force_login(self.author)
+        self.group_url = reverse('posts:group_list',
+                                 kwargs={'slug': self.group.slug})
+        self.detail_url = reverse('posts:post_detail',
+                                  kwargs={'post_id': self.post.pk})
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return lambda: client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_unchanged_pages_answer_304(self):
+        urls = (
+            self.group_url,
+            self.detail_url,
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(self.user, url)(), 304)
+
+    def test_only_affected_pages_change(self):
+        group_status = self.revalidate(self.guest, self.group_url)
+        Post.objects.create(text='В другой группе', author=self.author,
+                            group=self.other)
+        self.assertEqual(group_status(), 304)
+        Post.objects.create(text='В этой группе', author=self.author,
+                            group=self.group)
+        self.assertEqual(group_status(), 200)
+
+    def test_moving_post_changes_old_group(self):
+        group_status = self.revalidate(self.guest, self.group_url)
+        self.post.group = self.other
+        self.post.save()
+        self.assertEqual(group_status(), 200)
+
+    def test_group_change_changes_post_detail(self):
+        detail_status = self.revalidate(self.guest, self.detail_url)
+        self.group.title = 'Переименованная'
+        self.group.save()
+        self.assertEqual(detail_status(), 200)
+
+    def test_recount_changes_every_page(self):
+        """Пересчёт в обход сигналов сбрасывает валидаторы всех страниц"""
+        statuses = [self.revalidate(self.guest, url)
+                    for url in (self.group_url, self.detail_url)]
+        Post.objects.filter(pk=self.post.pk).update(comments_count=5)
+        # TestCase не коммитит, поэтому on_commit вызываем сразу
+        with mock.patch('django.db.transaction.on_commit',
+                        side_effect=lambda func: func()):
+            call_command('recount_counters', stdout=StringIO())
+        for status in statuses:
+            self.assertEqual(status(), 200)
+
+    def test_author_rename_changes_group_page(self):
+        """Имя автора есть в карточках на странице группы"""
+        group_status = self.revalidate(self.guest, self.group_url)
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        self.assertEqual(group_status(), 200)
+        self.assertContains(self.guest.get(self.group_url), 'Новое Имя')
+
+    def test_login_keeps_group_page(self):
+        group_status = self.revalidate(self.guest, self.group_url)
+        self.assertTrue(Client().login(username='etag-author',
+                                       password='password'))
+        self.assertEqual(group_status(), 304)
+
+    def test_comment_changes_post_detail(self):
+        detail_status = self.revalidate(self.guest, self.detail_url)
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        self.assertEqual(detail_status(), 200)
+
+    def test_stale_copy_gets_no_validators(self):
+        """Пока страницу перестраивает другой запрос, старая копия уходит
+        без ETag и Last-Modified новой версии"""
+        etag = self.guest.get(self.group_url)['ETag']
+        Post.objects.create(text='Новый пост', author=self.author,
+                            group=self.group)
+        key = _view_cache_key(RequestFactory().get(self.group_url))
+        self.assertIsNotNone(cache.get(key))
+        # аренду держит «другой запрос»
+        self.assertTrue(cache.add(f'{key}.lease', True))
+        response = self.guest.get(self.group_url)
+        self.assertNotContains(response, 'Новый пост')
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        cache.delete(f'{key}.lease')
+        response = self.guest.get(self.group_url)
+        self.assertContains(response, 'Новый пост')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cache_headers(self):
+        response = self.guest.get(self.group_url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        self.assertNotIn('Expires', response)
+        self.assertIn('Last-Modified', response)
+        response = self.user.get(self.group_url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+
+    def test_new_csrf_token_changes_etag(self):
+        """После повторного входа CSRF-токен другой, и страница с формой
+        комментария со старым токеном не получает 304"""
+        detail_status = self.revalidate(self.user, self.detail_url)
+        self.assertEqual(detail_status(), 304)
+        self.user.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        self.assertEqual(detail_status(), 200)
+
+    def test_user_and_guest_get_different_etags(self):
+        self.assertNotEqual(self.guest.get(self.detail_url)['ETag'],
+                            self.user.get(self.detail_url)['ETag'])
@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counter-author')
+        cls.reader = User.objects.create_user(username='counter-reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Счётчик постов автора следует за созданием и удалением"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author) for i in range(3))
+        self.assertEqual(self.stats(self.author).posts_count, 4)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 3)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Комментарий')
+        Comment.objects.create(post=post, author=self.reader, text='Ещё')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_follow_counters(self):
+        client = Client()
+        client.force_login(self.reader)
+        client.get(reverse('posts:profile_follow',
+                           kwargs={'username': self.author}))
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        client.get(reverse('posts:profile_unfollow',
+                           kwargs={'username': self.author}))
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_recount_command(self):
+        """Команда recount_counters исправляет разъехавшиеся счётчики"""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(posts_count=42, followers_count=42,
+                                 following_count=42)
+        Post.objects.update(comments_count=42)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('recount_counters', stdout=StringIO())
+        author_stats = self.stats(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_profile_reads_counter(self):
+        """Профиль берёт число постов из счётчика, без COUNT(*)"""
+        Post.objects.create(text='Пост', author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:profile',
+                                      kwargs={'username': self.author}))
+        self.assertEqual(response.context['posts_count'], 7)
+
+    def test_missing_stats_are_recounted_on_read(self):
+        """Профиль без строки счётчиков показывает пересчитанные значения"""
+        Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(user=self.author).delete()
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:profile',
+                                      kwargs={'username': self.author}))
+        self.assertEqual(response.context['posts_count'], 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
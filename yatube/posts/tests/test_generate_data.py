@@ -0,0 +1,49 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Post, TimelineEntry, UserStats
+from ..search import search_posts
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class GenerateDataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('generate_data', users=30, groups=3, posts=120,
+                     comments=200, follows=4, images=0.5, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_volumes_and_derived_data(self):
+        self.assertEqual(Post.objects.count(), 120)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertEqual(
+            Post.objects.values('pub_date').distinct().count(), 120)
+        stats = UserStats.objects.all()
+        self.assertEqual(sum(s.posts_count for s in stats), 120)
+        self.assertEqual(sum(s.followers_count for s in stats),
+                         Follow.objects.count())
+        self.assertEqual(sum(p.comments_count for p in Post.objects.all()),
+                         200)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(search_posts('утро').exists())
+
+    def test_bench_feeds_reports_every_view(self):
+        out = StringIO()
+        call_command('bench_feeds', requests=2, stdout=out)
+        for name in ('index', 'group_posts', 'profile', 'post_detail',
+                     'follow_index'):
+            with self.subTest(view=name):
+                self.assertIn(name, out.getvalue())
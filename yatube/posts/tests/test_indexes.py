@@ -0,0 +1,40 @@
+import re
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'SCAN (TABLE )?posts_\w+\s*$', re.MULTILINE)
+
+
+class IndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='index-tester')
+        cls.author = User.objects.create_user(username='index-author')
+        Group.objects.create(title='Группа', slug='index-group')
+        Post.objects.create(text='Пост', author=cls.author)
+
+    def test_follow_is_unique(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.user, author=self.author)
+
+    @skipUnless(connection.vendor == 'sqlite', 'формат EXPLAIN у SQLite')
+    def test_feed_queries_use_indexes(self):
+        """Ни один запрос лент не читает таблицы постов целиком"""
+        out = StringIO()
+        call_command('feed_query_plans', stdout=out, no_color=True)
+        plans = out.getvalue()
+        self.assertIn('post_group_pub_date_idx', plans)
+        self.assertIn('post_author_pub_date_idx', plans)
+        self.assertIn('comment_post_created_idx', plans)
+        self.assertIsNone(FULL_SCAN.search(plans), plans)
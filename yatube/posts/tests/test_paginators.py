@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post
+from ..paginators import CursorPaginator, FeedPaginator
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor-tester')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(25)
+        )
+        now = timezone.now()
+        for i, post in enumerate(Post.objects.order_by('id')):
+            # по три поста на одно время, чтобы проверить разрешение по id
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now + timedelta(minutes=i // 3))
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True))
+
+    def get_paginator(self, **kwargs):
+        return CursorPaginator(Post.objects.all(), 10, **kwargs)
+
+    def test_forward_pages_match_offset_order(self):
+        """Проход вперёд по курсорам отдаёт все посты в порядке ленты."""
+        paginator = self.get_paginator()
+        page = paginator.get_page(None)
+        seen = [post.id for post in page]
+        self.assertFalse(page.has_previous())
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen.extend(post.id for post in page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(page), 5)
+
+    def test_previous_cursor_returns_same_page(self):
+        """Курсор назад возвращает предыдущую страницу целиком."""
+        paginator = self.get_paginator()
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in first])
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = self.get_paginator()
+        for cursor in ('мусор', 'bm90LWpzb24', 'WyJ4IiwgW11d'):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual(page[0].id, self.expected[0])
+
+    def test_page_without_count_is_single_query(self):
+        """Без подсчёта общего числа страница стоит одного запроса."""
+        paginator = self.get_paginator()
+        cursor = paginator.get_page(None).next_cursor
+        with self.assertNumQueries(1):
+            page = self.get_paginator().get_page(cursor)
+            self.assertIsNone(page.paginator.count)
+
+    def test_count_is_optional(self):
+        self.assertEqual(self.get_paginator(with_count=True).count, 25)
+
+
+class FeedPaginatorTest(TestCase):
+    def test_elided_page_range(self):
+        paginator = FeedPaginator(range(1000), 10)
+        ellipsis = paginator.ELLIPSIS
+        cases = {
+            1: [1, 2, 3, 4, ellipsis, 99, 100],
+            50: [1, 2, ellipsis, 47, 48, 49, 50, 51, 52, 53, ellipsis,
+                 99, 100],
+            100: [1, 2, ellipsis, 97, 98, 99, 100],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(paginator.get_elided_page_range(number)), expected)
+
+    def test_short_range_is_not_elided(self):
+        paginator = FeedPaginator(range(100), 10)
+        self.assertEqual(list(paginator.get_elided_page_range(5)),
+                         list(range(1, 11)))
+
+
+@override_settings(PAGINATOR_ON_EACH_SIDE=1, PAGINATOR_ON_ENDS=1)
+class FeedPageLinksTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='page-links')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(95)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_renders_window_of_page_links(self):
+        response = Client().get(reverse('posts:index'), {'page': 5})
+        self.assertEqual(response.context['page_obj'].page_links,
+                         [1, '…', 4, 5, 6, '…', 10])
+        self.assertContains(response, '?page=6"')
+        self.assertNotContains(response, '?page=7"')
+
+
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor-reader')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(13)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def test_feeds_use_cursor_links(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        response = self.client.get(url)
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+        response = self.client.get(url, {'cursor': page_obj.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 3)
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='feed-author', first_name='Игнат', last_name='Тестов')
+        cls.reader = User.objects.create_user(username='feed-reader')
+        cls.group = Group.objects.create(
+            title='Группа для ленты',
+            slug='feed-group',
+            description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.feeds = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list',
+                                  kwargs={'slug': cls.group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': cls.author.username}),
+            'follow_index': reverse('posts:follow_index'),
+        }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def create_posts(self, count):
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author, group=self.group)
+            for i in range(count)
+        )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт вместе с числом постов."""
+        self.create_posts(1)
+        single = {name: self.count_queries(url)
+                  for name, url in self.feeds.items()}
+        self.create_posts(9)
+        for name, url in self.feeds.items():
+            with self.subTest(feed=name):
+                self.assertEqual(self.count_queries(url), single[name])
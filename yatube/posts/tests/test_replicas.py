@@ -0,0 +1,112 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.db.routers import PIN_SESSION_KEY, PrimaryReplicaRouter
+
+from ..cache import _view_cache_key
+from ..models import Post
+
+User = get_user_model()
+# зеркало тестовой базы из yatube.settings_test
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(TestCase):
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='replica-author')
+        cls.post = Post.objects.create(text='Пост на основной базе',
+                                       author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.detail_url = reverse('posts:post_detail',
+                                  kwargs={'post_id': self.post.pk})
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def is_pinned(self):
+        return PIN_SESSION_KEY in self.client.session
+
+    def test_feed_reads_go_to_replica(self):
+        self.assertGreater(self.replica_queries(reverse('posts:index')), 0)
+        self.assertGreater(self.replica_queries(self.detail_url), 0)
+
+    def test_session_pinned_after_write(self):
+        """После комментария автор читает свою запись с основной базы."""
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Свежий комментарий'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.is_pinned())
+        self.assertEqual(self.replica_queries(self.detail_url), 0)
+        session = self.client.session
+        session[PIN_SESSION_KEY] = 0
+        session.save()
+        self.assertGreater(self.replica_queries(self.detail_url), 0)
+
+    def test_session_not_pinned_without_write(self):
+        """Открытие формы и форма с ошибками не закрепляют сессию."""
+        requests = (
+            ('get', reverse('posts:post_create'), {}),
+            ('post', reverse('posts:post_create'), {'text': ''}),
+            ('post', reverse('posts:add_comment',
+                             kwargs={'post_id': self.post.pk}),
+             {'text': ''}),
+        )
+        for method, url, data in requests:
+            with self.subTest(method=method, url=url):
+                getattr(self.client, method)(url, data)
+                self.assertFalse(self.is_pinned())
+
+    def test_follow_pins_session(self):
+        reader = User.objects.create_user(username='replica-reader')
+        self.client.force_login(reader)
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author}))
+        self.assertTrue(self.is_pinned())
+
+    def test_replica_page_cached_no_longer_than_lag(self):
+        Client().get(reverse('posts:index'))
+        entry = cache.get(_view_cache_key(
+            RequestFactory().get(reverse('posts:index'))))
+        self.assertLessEqual(entry['expires'],
+                             time.time() + settings.REPLICA_PIN_SECONDS)
+
+    def test_replica_page_validated_only_after_lag(self):
+        """Страница с реплики сразу после изменения уходит без ETag: в
+        ней может не быть этого изменения"""
+        guest = Client()
+        response = guest.get(self.detail_url)
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-store', response['Cache-Control'])
+        with mock.patch('core.db.routers.time') as clock:
+            clock.time.return_value = (
+                time.time() + settings.REPLICA_PIN_SECONDS + 1)
+            response = guest.get(self.detail_url)
+        self.assertIn('ETag', response)
+
+    def test_writes_go_to_primary(self):
+        router = PrimaryReplicaRouter()
+        post = Post(pk=self.post.pk)
+        post._state.db = REPLICA
+        self.assertEqual(router.db_for_write(Post, instance=post),
+                         DEFAULT_DB_ALIAS)
+        self.assertIsNone(router.db_for_read(Post))
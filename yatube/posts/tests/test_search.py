@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.rare = Post.objects.create(
+            text='Кошки гуляют сами по себе', author=cls.user)
+        cls.often = Post.objects.create(
+            text='Кошки, кошки и ещё раз кошки', author=cls.user)
+        Post.objects.create(text='Про собак', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_results_are_ranked(self):
+        self.assertEqual(list(search_posts('кошки')),
+                         [self.often, self.rare])
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.create(text='Уникальное слово', author=self.user)
+        self.assertEqual(list(search_posts('уникальное')), [post])
+        post.text = 'Другой текст'
+        post.save(update_fields=['text'])
+        self.assertFalse(search_posts('уникальное').exists())
+        self.assertEqual(list(search_posts('другой')), [post])
+        post.delete()
+        self.assertFalse(search_posts('другой').exists())
+
+    def test_query_syntax_is_not_interpreted(self):
+        for query in ('"кошки', 'кошки AND', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                list(search_posts(query))
+
+    def test_like_backend_gives_same_posts(self):
+        # LIKE в SQLite не сравнивает кириллицу без учёта регистра,
+        # поэтому запрос в том же регистре, что и текст
+        with override_settings(
+                POSTS_SEARCH_BACKEND='posts.search.LikeSearchBackend'):
+            found = list(search_posts('ещё раз'))
+        self.assertEqual(found, list(search_posts('ещё раз')))
+        self.assertEqual(found, [self.often])
+
+    @override_settings(CONSTANTA_POSTS_ON_PAGE=1)
+    def test_search_page_keeps_query_in_page_links(self):
+        response = Client().get(reverse('posts:search'), {'q': 'кошки'})
+        self.assertEqual(list(response.context['page_obj']), [self.often])
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B8'
+                                      '&amp;page=2')
@@ -0,0 +1,131 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumb-author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_page_shows_original_until_thumbnail_ready(self):
+        """Пока миниатюры нет, страница отдаёт оригинал и не режет его"""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(thumbnails.lookup(self.post.image))
+
+    def test_page_shows_generated_thumbnail(self):
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertTrue(thumbnail.exists())
+        response = Client().get(reverse('posts:post_detail',
+                                        kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, thumbnail.url)
+
+    def test_warm_thumbnails_command(self):
+        out = StringIO()
+        call_command('warm_thumbnails', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertIsNotNone(thumbnails.lookup(self.post.image))
+
+    def test_attach_resolves_page_in_one_lookup(self):
+        """Миниатюры страницы читаются одним запросом, повторно — из кэша."""
+        posts = [self.post] + [
+            Post.objects.create(
+                text=f'Ещё пост {i}',
+                author=self.user,
+                image=SimpleUploadedFile(f'more{i}.gif', SMALL_GIF,
+                                         'image/gif'),
+            )
+            for i in range(2)
+        ]
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.attach(posts)
+        with self.assertNumQueries(0):
+            thumbnails.attach(posts)
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertEqual(post.image_url,
+                                 thumbnails.lookup(post.image).url)
+
+    def test_attach_falls_back_to_original(self):
+        post = Post.objects.create(text='Без картинки', author=self.user)
+        thumbnails.attach([self.post, post])
+        self.assertEqual(self.post.image_url, self.post.image.url)
+        self.assertEqual(post.image_url, '')
+
+    def test_srcset_lists_every_rendition(self):
+        thumbnails.generate(self.post.image.name)
+        response = Client().get(reverse('posts:index'))
+        ready = thumbnails.lookup_many([self.post.image])[self.post.image.name]
+        self.assertEqual(sorted(ready), sorted(settings.POST_IMAGE_WIDTHS))
+        for width, thumbnail in ready.items():
+            with self.subTest(width=width):
+                self.assertTrue(thumbnail.name.endswith('.webp'))
+                self.assertContains(response, f'{thumbnail.url} {width}w')
+
+    def test_feed_image_bytes_command(self):
+        thumbnails.generate(self.post.image.name)
+        out = StringIO()
+        call_command('feed_image_bytes', stdout=out)
+        self.assertIn(f'Оригиналы: {len(SMALL_GIF)} байт/стр.',
+                      out.getvalue())
+        self.assertNotIn('Не построено', out.getvalue())
+
+    def test_failed_thumbnail_is_not_rescheduled(self):
+        name = self.post.image.name
+        with mock.patch('posts.thumbnails.transaction') as transaction, \
+                mock.patch('posts.thumbnails.get_thumbnail',
+                           side_effect=OSError) as get_thumbnail, \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            transaction.on_commit.side_effect = lambda submit: submit()
+            thumbnails.attach([self.post])
+            thumbnails.attach([self.post])
+        self.assertEqual(get_thumbnail.call_count, 1)
+        self.assertEqual(self.post.image_url, self.post.image.url)
+        cache.delete(thumbnails._failed_key(name))
+        thumbnails.generate(name)
+        self.assertIsNotNone(thumbnails.lookup(self.post.image))
@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='timeline-author')
+        cls.other = User.objects.create_user(username='timeline-other')
+        cls.reader = User.objects.create_user(username='timeline-reader')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow_feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новый пост попадает в ленту подписчика, но не чужую"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Для подписчиков', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.follow_feed(), ['Для подписчиков'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты в ленту, отписка убирает"""
+        Post.objects.create(text='Старый пост', author=self.author)
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author}))
+        self.assertEqual(self.follow_feed(), ['Старый пост'])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author}))
+        self.assertEqual(self.follow_feed(), [])
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_read_on_request(self):
+        """Посты авторов со множеством подписчиков читаются при запросе"""
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='Пост знаменитости', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.follow_feed(), ['Пост знаменитости'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_former_celebrity_posts_kept_after_unfollow(self):
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='Пост знаменитости', author=self.author)
+        Follow.objects.filter(user=self.other).delete()
+        self.assertEqual(self.follow_feed(), ['Пост знаменитости'])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, TIMELINE_FANOUT_RESUME=2)
+    def test_fanout_resumed_by_command(self):
+        """Раскладка возобновляется командой, только когда подписчиков
+        стало меньше TIMELINE_FANOUT_RESUME"""
+        fan = User.objects.create_user(username='timeline-fan')
+        for user in (fan, self.other, self.reader):
+            Follow.objects.create(user=user, author=self.author)
+        post = Post.objects.create(text='Пост знаменитости',
+                                   author=self.author)
+        Follow.objects.filter(user=fan).delete()
+        call_command('resume_fanout', stdout=StringIO())
+        stats = UserStats.objects.get(user=self.author)
+        self.assertTrue(stats.celebrity)
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user=self.other).delete()
+        call_command('resume_fanout', stdout=StringIO())
+        stats.refresh_from_db()
+        self.assertFalse(stats.celebrity)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.follow_feed(), ['Пост знаменитости'])
+
+    def test_page_read_by_entry_index(self):
+        """Страница ленты читается по индексу записей, без сортировки
+        всей ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        entry = TimelineEntry.objects.get(user=self.reader)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        plan = Post.objects.feed().timeline(self.reader)[:10].explain()
+        self.assertIn('timeline_user_pub_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    @override_settings(POSTS_PAGINATION='cursor', CONSTANTA_POSTS_ON_PAGE=2)
+    def test_cursor_pages_follow_timeline_order(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        url = reverse('posts:follow_index')
+        page_obj = self.client.get(url).context['page_obj']
+        self.assertEqual([post.text for post in page_obj],
+                         ['Пост 2', 'Пост 1'])
+        response = self.client.get(url, {'cursor': page_obj.next_cursor})
+        self.assertEqual([post.text for post in response.context['page_obj']],
+                         ['Пост 0'])
@@ -0,0 +1,229 @@
+"""Миниатюры картинок постов, которые готовятся вне запроса.
+
+Тег {% thumbnail %} из sorl-thumbnail режет картинку прямо во время
+рендера первой страницы, на которой она встретилась. Здесь миниатюры
+строятся фоновым пулом после сохранения поста, а шаблоны только читают
+готовый результат из key-value хранилища sorl и, пока его нет, показывают
+оригинал.
+
+Каждая картинка режется в несколько ширин (POST_IMAGE_WIDTHS) с одной
+пропорцией, они отдаются браузеру через srcset.
+
+Картинка, которую построить не удалось, запоминается в кэше на
+THUMBNAIL_RETRY_SECONDS, и до тех пор рендеры её в очередь не ставят.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .cache import bump_feed_version, bump_post_versions
+
+logger = logging.getLogger(__name__)
+
+FAILED_KEY = 'thumbnails:failed:{}'
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def thumbnail_file(image, geometry, **options):
+    """ImageFile миниатюры с тем же именем, что даст get_thumbnail().
+
+    Повторяет нормализацию опций из ThumbnailBackend.get_thumbnail, но
+    ничего не читает из хранилищ и ничего не генерирует.
+    """
+    backend = default.backend
+    source = ImageFile(image)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def renditions():
+    """Варианты картинки из настроек: (ширина, геометрия, опции sorl),
+    от узкого к широкому."""
+    width, height = settings.POST_IMAGE_SIZE
+    options = {
+        'crop': 'center',
+        'upscale': True,
+        'format': settings.POST_IMAGE_FORMAT,
+        'quality': settings.POST_IMAGE_QUALITY,
+    }
+    return [(w, f'{w}x{round(w * height / width)}', dict(options))
+            for w in sorted(settings.POST_IMAGE_WIDTHS)]
+
+
+def _get_many_raw(keys):
+    """Сырые значения key-value хранилища sorl для набора ключей.
+
+    Для cached_db — один get_many в кэш и один запрос в базу за промахами,
+    для остальных хранилищ — поштучно, как это делает сам sorl.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    empty = cached_db_kvstore.EMPTY_VALUE
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # отсутствие тоже кэшируем, как sorl в _get_raw
+        kvstore.cache.set_many(
+            {key: found.get(key, empty) for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(found)
+    return {key: value for key, value in values.items()
+            if value and value != empty}
+
+
+def lookup_many(images):
+    """Готовые варианты картинок за один поход в хранилище.
+
+    Возвращает {имя картинки: {ширина: ImageFile}}, непостроенных
+    вариантов в словаре нет.
+    """
+    keys = {}
+    ready = {}
+    for image in images:
+        name = getattr(image, 'name', image)
+        ready[name] = {}
+        for width, geometry, options in renditions():
+            key = thumbnail_file(name, geometry, **options).key
+            keys[add_prefix(key, 'image')] = (name, width)
+    if keys:
+        for key, value in _get_many_raw(list(keys)).items():
+            name, width = keys[key]
+            ready[name][width] = deserialize_image_file(value)
+    return ready
+
+
+def lookup(image):
+    """Самый широкий готовый вариант или None, если он ещё не построен."""
+    if not image:
+        return None
+    name = getattr(image, 'name', image)
+    largest = renditions()[-1][0]
+    return lookup_many([name])[name].get(largest)
+
+
+def attach(posts):
+    """Проставляет постам image_url и image_srcset за один поход в
+    хранилище.
+
+    Пока построены не все варианты, в src идёт оригинал, а картинка
+    ставится в очередь.
+    """
+    with_image = []
+    for post in posts:
+        post.image_url = ''
+        post.image_srcset = ''
+        if post.image:
+            with_image.append(post)
+    ready = lookup_many(post.image for post in with_image)
+    widths = [width for width, _, _ in renditions()]
+    for post in with_image:
+        variants = ready[post.image.name]
+        post.image_srcset = ', '.join(
+            f'{variants[width].url} {width}w'
+            for width in widths if width in variants)
+        if len(variants) == len(widths):
+            post.image_url = variants[widths[-1]].url
+        else:
+            schedule(post.image)
+            post.image_url = post.image.url
+
+
+def _failed_key(name):
+    # имя файла может не подойти в ключ memcached по длине и символам
+    return FAILED_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def generate(name):
+    try:
+        for _, geometry, options in renditions():
+            get_thumbnail(name, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+        cache.set(_failed_key(name), True,
+                  settings.THUMBNAIL_RETRY_SECONDS)
+    else:
+        cache.delete(_failed_key(name))
+        # карточки постов закэшированы с оригиналом вместо миниатюры
+        bump_feed_version()
+        _bump_image_versions(name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+
+
+def _bump_image_versions(name):
+    from .models import Post
+
+    posts = Post.objects.filter(image=name).values_list(
+        'pk', 'author_id', 'group_id')
+    for post_id, author_id, group_id in posts:
+        bump_post_versions(post_id, author_id, group_id)
+
+
+def _generate_in_worker(name):
+    try:
+        generate(name)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def schedule(image):
+    """Ставит построение миниатюр картинки в очередь после коммита.
+
+    При THUMBNAIL_WORKERS = 0 пула нет и миниатюры строятся сразу в
+    текущем потоке — это локальная замена очереди для разработки.
+    """
+    if not image:
+        return
+    name = image.name
+
+    def submit():
+        if cache.get(_failed_key(name)):
+            return
+        with _pending_lock:
+            if name in _pending:
+                return
+            _pending.add(name)
+        if settings.THUMBNAIL_WORKERS:
+            get_executor().submit(_generate_in_worker, name)
+        else:
+            generate(name)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,114 @@
+"""Лента подписок с раскладкой постов по подписчикам при публикации.
+
+Чтение ленты — PostQuerySet.timeline(); здесь поддерживается таблица
+TimelineEntry при публикации постов и при подписке/отписке.
+
+Автор, у которого подписчиков стало больше TIMELINE_FANOUT_LIMIT,
+помечается знаменитостью, и его посты дальше дочитываются при запросе
+ленты. Обратно раскладка включается не при отписке, а командой
+resume_fanout, когда подписчиков меньше TIMELINE_FANOUT_RESUME.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id, celebrity=True).exists()
+
+
+def promote(author_id):
+    """Помечает автора знаменитостью, если подписчиков больше порога."""
+    UserStats.objects.filter(
+        user_id=author_id, celebrity=False,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).update(celebrity=True)
+
+
+def fan_out(posts):
+    """Кладёт посты в ленты всех подписчиков их авторов."""
+    by_author = {}
+    for post in posts:
+        # bulk_create в SQLite не проставляет id, такие посты разложит
+        # rebuild()
+        if post.pk:
+            by_author.setdefault(post.author_id, []).append(
+                (post.pk, post.pub_date))
+    for author_id, post_dates in by_author.items():
+        if is_celebrity(author_id):
+            continue
+        follower_ids = Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True)
+        add_entries(follower_ids.iterator(), post_dates)
+
+
+def add_entries(user_ids, post_dates):
+    """Записи ленты для пар пользователь × (id поста, дата публикации)."""
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id in user_ids
+         for post_id, pub_date in post_dates),
+        batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика уже вышедшие посты автора."""
+    promote(author_id)
+    if is_celebrity(author_id):
+        return
+    post_dates = Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date')
+    add_entries([user_id], post_dates.iterator())
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def resume():
+    """Возобновляет раскладку для бывших знаменитостей.
+
+    Посты автора раскладываются всем его подписчикам, и только потом
+    снимается флаг — до этого лента продолжает дочитывать их при запросе.
+    Возвращает число таких авторов.
+    """
+    authors = UserStats.objects.filter(
+        celebrity=True,
+        followers_count__lt=settings.TIMELINE_FANOUT_RESUME
+    ).values_list('user_id', flat=True)
+    resumed = 0
+    for author_id in authors:
+        with transaction.atomic():
+            _fan_out_author(author_id)
+            resumed += UserStats.objects.filter(
+                user_id=author_id).update(celebrity=False)
+    return resumed
+
+
+def _fan_out_author(author_id):
+    post_dates = list(Post.objects.filter(
+        author_id=author_id).values_list('pk', 'pub_date'))
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    add_entries(follower_ids.iterator(), post_dates)
+
+
+def rebuild():
+    """Собирает все ленты подписок заново по таблицам подписок и постов."""
+    TimelineEntry.objects.all().delete()
+    UserStats.objects.update(celebrity=False)
+    UserStats.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).update(celebrity=True)
+    authors = Follow.objects.values_list('author_id', flat=True).distinct()
+    for author_id in authors:
+        if is_celebrity(author_id):
+            continue
+        _fan_out_author(author_id)
@@ -0,0 +1,43 @@
+from django.conf import settings
+
+from . import thumbnails
+from .models import Comment
+from .paginators import CursorPaginator, FeedPaginator
+
+
+def get_page_obj(request, queryset, cursor=None,
+                 ordering=('-pub_date', '-id')):
+    """Страница ленты; cursor=False — всегда по номерам страниц, например
+    для выдачи, отсортированной не по дате. ordering — уникальная
+    сортировка для курсоров."""
+    per_page = settings.CONSTANTA_POSTS_ON_PAGE
+    if cursor is None:
+        cursor = settings.POSTS_PAGINATION == 'cursor'
+    if cursor:
+        paginator = CursorPaginator(
+            queryset, per_page, ordering=ordering,
+            with_count=settings.POSTS_PAGINATION_COUNT)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        paginator = FeedPaginator(queryset, per_page)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_obj.page_links = page_links(page_obj)
+    thumbnails.attach(page_obj)
+    return page_obj
+
+
+def get_comments_page(request, post_id):
+    """Очередная порция комментариев поста по ?cursor=, от старых к новым."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    paginator = CursorPaginator(comments, settings.COMMENTS_ON_PAGE,
+                                ordering=('created', 'id'))
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def page_links(page_obj):
+    """Номера страниц для ссылок: окно вокруг текущей и края ленты."""
+    return list(page_obj.paginator.get_elided_page_range(
+        page_obj.number,
+        on_each_side=settings.PAGINATOR_ON_EACH_SIDE,
+        on_ends=settings.PAGINATOR_ON_ENDS))
@@ -1,32 +1,64 @@
-from django.conf import settings
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from core.db.routers import pin_to_primary, read_from_replica
+
+from . import thumbnails
+from .cache import cache_feed, conditional_page
 from .forms import CommentForm, PostForm
-from .models import Group, Post, User, Follow
+from .models import TIMELINE_ORDERING, Group, Post, User, Follow, UserStats
+from .search import search_posts
+from .utils import get_comments_page, get_page_obj
 
 
-@cache_page(20)
+@cache_feed
+@read_from_replica
 def index(request):
-    posts_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(posts_list, settings.CONSTANTA_POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts_list = Post.objects.feed().order_by('-pub_date')
+    page_obj = get_page_obj(request, posts_list)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+def group_scopes(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return None if group_id is None else [f'group:{group_id}']
+
+
+def profile_scopes(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return None if author_id is None else [f'author:{author_id}']
+
+
+def post_scopes(post_id):
+    # страница поста показывает и счётчик постов автора, и название группы
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is None:
+        return None
+    author_id, group_id = post
+    scopes = [f'post:{post_id}', f'author:{author_id}']
+    if group_id:
+        scopes.append(f'group:{group_id}')
+    return scopes
+
+
+@conditional_page(group_scopes)
+@cache_feed
+@read_from_replica
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group).order_by('-pub_date')
-    paginator = Paginator(posts, settings.CONSTANTA_POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.feed().filter(group=group).order_by('-pub_date')
+    page_obj = get_page_obj(request, posts)
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -36,13 +68,14 @@ def group_posts(request, slug):
 
 
 @login_required
+@conditional_page(profile_scopes)
+@cache_feed
+@read_from_replica
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts_profile = author.posts.all().order_by('-pub_date')
-    posts_count = posts_profile.count()
-    paginator = Paginator(posts_profile, settings.CONSTANTA_POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts_profile = author.posts.feed().order_by('-pub_date')
+    stats = UserStats.objects.for_user(author)
+    page_obj = get_page_obj(request, posts_profile)
     try:
         following = Follow.objects.get(user=request.user, author=author)
     except Exception:
@@ -50,29 +83,74 @@ def profile(request, username):
     context = {
         'author': author,
         'page_obj': page_obj,
-        'posts_count': posts_count,
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'following': following,
     }
     return render(request, 'posts/profile.html', context)
 
 
+@cache_feed
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(query, Post.objects.feed())
+    page_obj = get_page_obj(request, posts, cursor=False)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        # ссылки пагинатора должны сохранять запрос
+        'page_params': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@conditional_page(post_scopes)
+@read_from_replica
 def post_detail(request, post_id):
-    selected_post = get_object_or_404(Post, id=post_id)
+    selected_post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id)
+    thumbnails.attach([selected_post])
     author = selected_post.author
-    posts_count = author.posts.count()
+    posts_count = UserStats.objects.for_user(author).posts_count
 
     context = {
         'selected_post': selected_post,
         'author': author,
         'posts_count': posts_count,
         'form': CommentForm,
-        'comments': selected_post.comments.all(),
+        'comments': get_comments_page(request, post_id),
         'post_id': post_id
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев: HTML-фрагмент или ?format=json."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = get_comments_page(request, post_id)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.next_cursor,
+        })
+    context = {
+        'comments': comments,
+        'post_id': post_id,
+    }
+    return render(request, 'posts/includes/comments_batch.html', context)
+
+
 @login_required()
+@pin_to_primary
+@transaction.atomic
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(request.POST or None, files=request.FILES or None)
@@ -87,6 +165,7 @@ def post_create(request):
 
 
 @login_required
+@pin_to_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     is_edit = True
@@ -94,7 +173,10 @@ def post_edit(request, post_id):
         form = PostForm(request.POST or None, files=request.FILES or None,
                         instance=post)
         if form.is_valid():
-            form.save()
+            # сохраняем только поля формы, чтобы не затереть счётчик
+            # комментариев, который мог измениться параллельно
+            form.save(commit=False).save(
+                update_fields=[*PostForm.Meta.fields, 'updated_at'])
             return redirect('posts:post_detail', post_id=post_id)
         return render(request, 'posts/post_create.html',
                       {'form': form, 'is_edit': is_edit, 'post_id': post_id})
@@ -102,6 +184,8 @@ def post_edit(request, post_id):
 
 
 @login_required
+@pin_to_primary
+@transaction.atomic
 def add_comment(request, post_id):
     selected_post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -114,11 +198,12 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache_feed
+@read_from_replica
 def follow_index(request):
-    follow_post = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(follow_post, settings.CONSTANTA_POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    follow_post = Post.objects.feed().timeline(request.user)
+    page_obj = get_page_obj(request, follow_post,
+                            ordering=TIMELINE_ORDERING)
     context = {
         'page_obj': page_obj,
     }
@@ -126,6 +211,8 @@ def follow_index(request):
 
 
 @login_required
+@pin_to_primary
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -134,9 +221,9 @@ def profile_follow(request, username):
 
 
 @login_required
+@pin_to_primary
+@transaction.atomic
 def profile_unfollow(request, username):
     follow_author = get_object_or_404(User, username=username)
-    unfollow = Follow.objects.get(user=request.user, author=follow_author)
-    if unfollow is not None:
-        unfollow.delete()
+    Follow.objects.filter(user=request.user, author=follow_author).delete()
     return redirect('posts:profile', username=username)
@@ -19,13 +19,19 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
+# Боевой профиль включается переменными окружения: DJANGO_DEBUG=0,
+# DJANGO_SECRET_KEY и DJANGO_ALLOWED_HOSTS (через запятую). Без DEBUG
+# шаблоны разбираются один раз на процесс и прогреваются при старте.
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = '&l5tvd(-tb!7mbj@e-i++9vvi-enba3to*7itf($fqs*=i+(n6'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY', '&l5tvd(-tb!7mbj@e-i++9vvi-enba3to*7itf($fqs*=i+(n6')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = ['127.0.0.1', 'test', 'localhost', '[::1]']
+ALLOWED_HOSTS = os.environ.get(
+    'DJANGO_ALLOWED_HOSTS', '127.0.0.1,test,localhost,[::1]').split(',')
 
 
 # Application definition
@@ -45,7 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.static.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,18 +65,34 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# В разработке шаблоны перечитываются с диска на каждый рендер, чтобы
+# правки были видны сразу; иначе — разобранные шаблоны хранятся в памяти
+# процесса, а wsgi.py разбирает их все до первого запроса.
+TEMPLATES_CACHED = os.environ.get(
+    'DJANGO_TEMPLATES_CACHED', '0' if DEBUG else '1') == '1'
+TEMPLATES_WARM_UP = TEMPLATES_CACHED
+if TEMPLATES_CACHED:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'debug': DEBUG,
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'core.context_processors.year.year'
+                'core.context_processors.year.year',
+                'core.context_processors.feed.feed',
             ],
         },
     },
@@ -80,13 +104,66 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# База берётся из окружения, по умолчанию — файл SQLite рядом с проектом.
+# Для PostgreSQL с пулом соединений: DB_ENGINE=core.db.backends.postgresql_pool
+# (драйвер ставится из requirements-postgresql.txt); CONN_MAX_AGE тогда по
+# умолчанию 0 — соединение после запроса возвращается в пул, а не остаётся
+# за потоком.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.sqlite3')
+DB_POOLED = DB_ENGINE == 'core.db.backends.postgresql_pool'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('DB_NAME',
+                               os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # сколько секунд держать соединение потока открытым между запросами
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE',
+                                           0 if DB_POOLED else 60)),
+        'OPTIONS': {},
     }
 }
 
+if DB_POOLED:
+    DATABASES['default']['OPTIONS'].update(
+        POOL_MIN_SIZE=int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+        POOL_MAX_SIZE=int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        # сколько секунд ждать соединение, если все выданы другим потокам
+        POOL_TIMEOUT=float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    )
+
+# Реплики только для чтения: DB_REPLICAS=адрес1,адрес2 — хосты реплик или,
+# для SQLite, пути к файлам-копиям (их обновляет команда sync_replicas).
+# С реплик читают ленты и страница поста (core.db.routers).
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    DATABASES[alias]['NAME' if DB_ENGINE.endswith('sqlite3')
+                     else 'HOST'] = address.strip()
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db.routers.PrimaryReplicaRouter']
+
+# на сколько секунд реплика может отставать: столько после записи сессия
+# читает из основной базы, и не дольше кэшируются страницы, прочитанные с
+# реплики
+REPLICA_PIN_SECONDS = 5
+
+# Прагмы для каждого нового соединения с SQLite (core.db.sqlite)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+    'cache_size': -20000,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -106,6 +183,20 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Пользователь сессии берётся из кэша (core.auth) и выбрасывается из него
+# при сохранении, а сессии читаются из кэша с записью в базу — запрос
+# вошедшего пользователя не ходит в базу за состоянием входа.
+# ModelBackend остаётся в списке для сессий, открытых до перехода на
+# CachedModelBackend: get_user() проверяет, что путь бэкенда из сессии есть
+# в этом списке, иначе все вошедшие пользователи разлогинились бы
+AUTHENTICATION_BACKENDS = [
+    'core.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+SESSION_ENGINE = os.environ.get(
+    'DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -126,6 +217,16 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT',
+                             os.path.join(BASE_DIR, 'collected_static'))
+# Вне DEBUG collectstatic добавляет хэш к именам файлов и пишет рядом
+# сжатые .gz и .br копии (core.staticfiles), а StaticFilesMiddleware
+# отдаёт их сам с кэшированием на год.
+STATICFILES_SERVE = os.environ.get(
+    'DJANGO_SERVE_STATIC', '0' if DEBUG else '1') == '1'
+if not DEBUG:
+    STATICFILES_STORAGE = (
+        'core.staticfiles.CompressedManifestStaticFilesStorage')
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -136,12 +237,93 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CONSTANTA_POSTS_ON_PAGE = 10
+# по сколько комментариев показывать под постом и подгружать за раз
+COMMENTS_ON_PAGE = 20
+# сколько ссылок на страницы показывать вокруг текущей и по краям
+PAGINATOR_ON_EACH_SIDE = 3
+PAGINATOR_ON_ENDS = 2
+# 'page' — обычные номера страниц, 'cursor' — keyset-пагинация по ?cursor=
+POSTS_PAGINATION = 'page'
+# считать ли COUNT(*) всей ленты в режиме 'cursor'
+POSTS_PAGINATION_COUNT = False
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кэш двухуровневый (core.cache.backends): LRU в памяти процесса перед
+# общим для всех процессов кэшем. Общий задаётся CACHE_BACKEND и
+# CACHE_LOCATION и должен атомарно выполнять add и incr: Memcached или Redis.
+# По умолчанию это каталог cache рядом с проектом (FileBasedCache) — только
+# для разработки в одном процессе; без DEBUG такой кэш не запустится, пока
+# не задан CACHE_BACKEND (или явно CACHE_SINGLE_PROCESS=1).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.backends.TwoTierCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'SYNC_INTERVAL': 1,
+            'LOG_SIZE': 1000,
+            'SINGLE_PROCESS': os.environ.get(
+                'CACHE_SINGLE_PROCESS', '1' if DEBUG else '0') == '1',
+        },
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION',
+                                   os.path.join(BASE_DIR, 'cache')),
+        # по умолчанию 300: лишние записи вытеснялись бы вместе с арендами,
+        # версиями и сессиями
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 100000)),
+        },
+    },
 }
+
+# ленты сбрасываются сигналами при изменениях, так что TTL можно держать
+# длинным
+FEED_CACHE_TIMEOUT = 60 * 60
+# сколько секунд после срока или смены версии страница ещё может уйти
+# устаревшей, пока её перестраивает другой запрос, и сколько этот запрос
+# держит аренду на перестройку
+FEED_CACHE_STALE_TIMEOUT = 5 * 60
+FEED_CACHE_LEASE_TIMEOUT = 10
+# сколько секунд обратный прокси может отдавать анонимам страницу группы,
+# профиля или поста без перепроверки
+PAGE_SHARED_MAX_AGE = 60
+
+# посты авторов с большим числом подписчиков не раскладываются по лентам
+# при публикации, а дочитываются при открытии ленты подписок
+TIMELINE_FANOUT_LIMIT = 10000
+# раскладка возобновляется командой resume_fanout, только когда
+# подписчиков стало заметно меньше порога, чтобы автор на границе не
+# переключался туда-обратно при каждой подписке и отписке
+TIMELINE_FANOUT_RESUME = 9000
+
+# сколько потоков строят миниатюры картинок постов; 0 — строить сразу после
+# коммита в том же потоке, без пула
+THUMBNAIL_WORKERS = 2
+# сколько секунд не браться снова за картинку, миниатюру которой построить
+# не удалось
+THUMBNAIL_RETRY_SECONDS = 600
+
+# варианты картинок постов для srcset: пропорция кадра, ширины, формат и
+# качество сжатия
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 80
+
+# бэкенд поиска по постам: FTS5-индекс на SQLite, LIKE без индекса на
+# остальных базах
+POSTS_SEARCH_BACKEND = (
+    'posts.search.SQLiteFTSBackend' if DB_ENGINE.endswith('sqlite3')
+    else 'posts.search.LikeSearchBackend')
+
+# заголовок Server-Timing и гистограммы /metrics/ по каждому URL; при False
+# middleware не подключается вовсе
+REQUEST_METRICS_ENABLED = True
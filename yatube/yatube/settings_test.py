@@ -0,0 +1,24 @@
+"""Настройки для тестов поверх yatube.settings.
+
+manage.py test подключает их сам; для pytest:
+DJANGO_SETTINGS_MODULE=yatube.settings_test.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES, SQLITE_PRAGMAS
+
+# Зеркало тестовой базы для тестов маршрутизации: отдельной базы Django для
+# него не создаёт, включается оно override_settings(DATABASE_REPLICAS).
+DATABASES['replica'] = dict(DATABASES['default'],
+                            TEST={'MIRROR': 'default'})
+
+# Тестовая база SQLite в памяти открыта в режиме shared cache: без этого
+# «реплика» упирается в блокировки незакрытой транзакции теста.
+SQLITE_PRAGMAS['read_uncommitted'] = 1
+
+# общий кэш у каждого прогона свой и не пишется на диск; тесты идут в
+# одном процессе
+CACHES['shared'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'OPTIONS': {'MAX_ENTRIES': 100000},
+}
+CACHES['default']['OPTIONS']['SINGLE_PROCESS'] = True